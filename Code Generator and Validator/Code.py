@@ -1,9 +1,19 @@
-from transformers import pipeline
+import os
+import sys
 from docx import Document
 from fpdf import FPDF
 
-# **Load Hugging Face LLM optimized for code generation**
-code_generator = pipeline("text-generation", model="Salesforce/codegen-350M-mono")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.batching import run_pipeline
+from shared.registry import get_pipeline
+from shared.streaming import stream_generate
+
+# **Hugging Face LLM optimized for code generation, loaded on first use**
+MODEL_NAME = "Salesforce/codegen-350M-mono"
+
+def get_code_generator():
+    """Returns the shared text-generation pipeline used for code."""
+    return get_pipeline("text-generation", model=MODEL_NAME)
 
 # **Supported Programming Languages & File Extensions**
 LANGUAGE_EXTENSIONS = {
@@ -120,7 +130,33 @@ def generate_code(question, language):
     """
     Generates optimized, well-commented code for a given problem.
     """
-    prompt = (
+    prompt = build_code_prompt(question, language)
+
+    try:
+        response = run_pipeline(get_code_generator, prompt, max_length=700, temperature=0.5, top_p=0.9, do_sample=True)
+        generated_code = response[0]["generated_text"].strip()
+        return generated_code
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+def stream_code(question, language):
+    """
+    Streaming variant of generate_code that yields the code as it is generated.
+    """
+    prompt = build_code_prompt(question, language)
+
+    try:
+        yield from stream_generate(
+            get_code_generator(), prompt, max_length=700, temperature=0.5, top_p=0.9, do_sample=True
+        )
+    except Exception as e:
+        yield f"❌ Error: {str(e)}"
+
+def build_code_prompt(question, language):
+    """
+    Builds the code generation prompt shared by generate_code and stream_code.
+    """
+    return (
         f"Write a {language} program to solve the following problem:\n\n"
         f"### Problem Description:\n{question}\n\n"
         f"### Requirements:\n"
@@ -130,13 +166,6 @@ def generate_code(question, language):
         f"### Code:\n"
     )
 
-    try:
-        response = code_generator(prompt, max_length=700, temperature=0.5, top_p=0.9, do_sample=True)
-        generated_code = response[0]["generated_text"].strip()
-        return generated_code
-    except Exception as e:
-        return f"❌ Error: {str(e)}"
-
 def explain_code(code, language):
     """
     Generates a step-by-step explanation of the provided code.
@@ -148,7 +177,7 @@ def explain_code(code, language):
     )
 
     try:
-        response = code_generator(prompt, max_length=700, temperature=0.5, top_p=0.9, do_sample=True)
+        response = run_pipeline(get_code_generator, prompt, max_length=700, temperature=0.5, top_p=0.9, do_sample=True)
         explanation = response[0]["generated_text"].strip()
         return explanation
     except Exception as e:
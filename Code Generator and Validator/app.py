@@ -1,6 +1,5 @@
 import streamlit as st
-from Code import generate_code, explain_code, save_file, LANGUAGE_EXTENSIONS  # Import functions from code.py
-import time
+from Code import stream_code, explain_code, save_file, LANGUAGE_EXTENSIONS  # Import functions from code.py
 
 # Page configuration with custom theme and icon
 st.set_page_config(
@@ -96,16 +95,16 @@ if option == "Generate Code":
     if st.button("🔮 Generate Optimized Code", key="gen_btn", type="primary"):
         if question.strip():
             with st.spinner("AI is crafting your code..."):
-                # Simulating delay for better UX
-                progress_bar = st.progress(0)
-                for i in range(100):
-                    time.sleep(0.01)
-                    progress_bar.progress(i + 1)
-                
-                generated_code = generate_code(question, language)
-                
                 st.markdown("### 🎉 Generated Code:")
-                st.code(generated_code, language=language.lower())
+                
+                # Show the code as it is generated
+                code_placeholder = st.empty()
+                generated_code = ""
+                for piece in stream_code(question, language):
+                    generated_code += piece
+                    code_placeholder.code(generated_code, language=language.lower())
+                generated_code = generated_code.strip()
+                code_placeholder.code(generated_code, language=language.lower())
                 
                 # Copy to clipboard button (using JavaScript)
                 st.markdown("""
@@ -1,6 +1,9 @@
 import streamlit as st
 import time
-from correcter import correct_text, extract_text_from_pdf, extract_text_from_docx, extract_text_from_txt
+from itertools import islice
+from correcter import (
+    correct_text, correct_pages, extract_text_from_docx, extract_text_from_txt, format_timings, iter_pdf_pages
+)
 
 # Page configuration
 st.set_page_config(
@@ -88,24 +91,53 @@ with st.sidebar:
         - Overall readability
         """)
 
+# Per-session store of paragraph corrections, so re-running only corrects edited paragraphs
+if 'paragraph_corrections' not in st.session_state:
+    st.session_state.paragraph_corrections = {}
+
 # Main content area
 col1, col2 = st.columns([1, 1])
 
+PDF_PREVIEW_PAGES = 3  # Pages of an uploaded PDF shown in the text area; the whole PDF is streamed on correction
+
+def count_pages(pages, counts):
+    """Passes pages through while counting their words, characters and sentences."""
+    for page in pages:
+        counts["words"] += len(page.split())
+        counts["characters"] += len(page) + 1
+        counts["sentences"] += page.count('.')
+        yield page
+
 # Text extraction from uploaded file
 text = ""
 if uploaded_file:
     with st.spinner("Extracting text from document..."):
         file_type = uploaded_file.type
         if file_type == "application/pdf":
-            text = extract_text_from_pdf(uploaded_file)
+            # Only the first pages are read, in-process and once per file; the PDF itself is streamed on correction
+            preview_key = (uploaded_file.name, uploaded_file.size)
+            if st.session_state.get("pdf_preview_key") != preview_key:
+                try:
+                    preview = "\n".join(islice(iter_pdf_pages(uploaded_file, workers=1), PDF_PREVIEW_PAGES))
+                    if not preview:
+                        preview = "Error: Could not extract text from PDF."
+                except Exception as e:
+                    preview = f"Error extracting text: {str(e)}"
+                st.session_state.pdf_preview_key = preview_key
+                st.session_state.pdf_preview = preview
+            text = st.session_state.pdf_preview
         elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
             text = extract_text_from_docx(uploaded_file)
         elif file_type == "text/plain":
             text = extract_text_from_txt(uploaded_file)
         
-        if text.startswith("Error:"):
+        if text.startswith("Error"):
             st.error(text)
             text = ""
+        elif file_type == "application/pdf":
+            st.success(
+                f"Showing the first pages of {uploaded_file.name}. The whole document is corrected page by page."
+            )
         else:
             st.success(f"Successfully extracted {len(text.split())} words from {uploaded_file.name}")
 
@@ -139,12 +171,29 @@ if st.button("🔍 Correct Grammar & Style", help="Analyze and improve your text
                 time.sleep(0.01)
                 progress_bar.progress(i + 1)
             
-            # Get corrected text
-            corrected_text = correct_text(input_text, style)
+            # Get corrected text. An unedited PDF preview stands for the whole PDF, which is streamed
+            # page by page into the corrector without ever being held in full.
+            page_timings = []
+            if uploaded_file and uploaded_file.type == "application/pdf" and text and input_text == text:
+                counts = {"words": 0, "characters": -1, "sentences": 0}
+                try:
+                    pages = count_pages(iter_pdf_pages(uploaded_file, timings=page_timings), counts)
+                    corrected_text = "\n".join(correct_pages(pages, style))
+                except Exception as e:
+                    corrected_text = f"Error: {str(e)}"
+                word_count_orig, char_count_orig = counts["words"], max(counts["characters"], 0)
+                sentence_count_orig = counts["sentences"]
+            else:
+                corrected_text = correct_text(
+                    input_text, style, chunked=True, paragraph_store=st.session_state.paragraph_corrections
+                )
+                sentence_count_orig = input_text.count('.')
             
             # Display the corrected text
             with col2:
                 st.markdown('<p class="subheader">✨ Corrected Text</p>', unsafe_allow_html=True)
+                if page_timings:
+                    st.caption(format_timings(page_timings))
                 st.text_area(
                     "AI-enhanced version:",
                     corrected_text,
@@ -160,7 +209,7 @@ if st.button("🔍 Correct Grammar & Style", help="Analyze and improve your text
                 metrics_col1.metric("Words", f"{word_count_new}", delta=f"{word_count_new - word_count_orig}")
                 metrics_col2.metric("Characters", f"{char_count_new}", delta=f"{char_count_new - char_count_orig}")
                 metrics_col3.metric("Sentences", f"{corrected_text.count('.')}", 
-                                  delta=f"{corrected_text.count('.') - input_text.count('.')}")
+                                  delta=f"{corrected_text.count('.') - sentence_count_orig}")
                 
                 # Download options
                 st.download_button(
@@ -1,46 +1,270 @@
-import PyPDF2
+import os
+import re
+import sys
 from docx import Document
-from transformers import pipeline
 
-# Load a Hugging Face grammar correction model
-corrector = pipeline("text2text-generation", model="grammarly/coedit-large")  # Can be changed based on preference
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.batching import run_pipeline
+from shared.cache import make_key, result_cache
+from shared.extraction import format_timings, iter_pdf_pages
+from shared.onnx_backend import get_seq2seq_pipeline
 
-def correct_text(text: str, style: str) -> str:
+# Hugging Face grammar correction model, loaded on first use
+CORRECTOR_MODEL = "grammarly/coedit-large"  # Can be changed based on preference
+
+# Long documents are corrected in sentence-aligned segments of bounded size
+SEGMENT_TOKENS = 200  # Token budget of one segment, leaving room for the instruction
+CORRECTION_BATCH_SIZE = 8  # Segments corrected per forward pass
+PAGES_PER_WINDOW = 8  # Pages held in memory at once when correcting page by page
+CHUNK_INSTRUCTION = "Fix the grammar and make this text {style}: "  # Short per-segment instruction
+GENERATION_KWARGS = {"max_length": 512, "do_sample": False}  # Adjust max_length as needed
+
+def get_corrector():
+    """Returns the shared grammar correction pipeline, loading it on first use."""
+    return get_seq2seq_pipeline("text2text-generation", model=CORRECTOR_MODEL)
+
+def correct_text(text: str, style: str, chunked: bool = False, paragraph_store: dict = None) -> str:
     """
     Corrects grammar, improves clarity, and refines writing style.
     
     :param text: The input text that needs correction.
     :param style: The writing style to refine the text into (Formal, Casual, Professional, Academic, etc.).
+    :param chunked: Correct the text in sentence-aligned segments so documents of any length fit
+                    the model. By default the whole text is sent in a single prompt.
+    :param paragraph_store: Optional per-session dict of earlier paragraph corrections (chunked mode
+                            only). Unchanged paragraphs are reused and only edited ones reach the model.
     :return: The corrected text with enhanced readability and grammar.
     """
     if not text or not style:
         return "Error: Both text and style parameters must be provided."
 
-    # Detailed prompt for better accuracy
-    prompt = (
-        f"Improve the grammar, sentence structure, and clarity of the following text. "
-        f"Ensure it maintains the original meaning but refines readability. "
-        f"Adjust the tone to be {style.lower()} and fix punctuation or awkward phrasing where needed.\n\n"
-        f"Original Text:\n{text}"
-    )
-
     try:
-        correction = corrector(prompt, max_length=512, do_sample=False)  # Adjust max_length as needed
-        return correction[0]['generated_text']
+        if chunked:
+            return correct_text_chunked(text, style, paragraph_store=paragraph_store)
+
+        # Detailed prompt for better accuracy
+        prompt = (
+            f"Improve the grammar, sentence structure, and clarity of the following text. "
+            f"Ensure it maintains the original meaning but refines readability. "
+            f"Adjust the tone to be {style.lower()} and fix punctuation or awkward phrasing where needed.\n\n"
+            f"Original Text:\n{text}"
+        )
+        return cached_corrections([prompt])[0]
     except Exception as e:
         return f"Error: {str(e)}"
 
-def extract_text_from_pdf(pdf_file_path: str) -> str:
+def correct_text_chunked(text: str, style: str, batch_size: int = CORRECTION_BATCH_SIZE, paragraph_store: dict = None) -> str:
+    """
+    Corrects a document of any length segment by segment.
+    
+    The text is split on paragraph and sentence boundaries into segments of at most
+    SEGMENT_TOKENS tokens. Every segment gets a short instruction, the segments are
+    corrected in batches, and the results are stitched back together in order with the
+    original paragraph breaks.
+    
+    :param text: The input text that needs correction.
+    :param style: The writing style to refine the text into.
+    :param batch_size: Number of segments per forward pass.
+    :param paragraph_store: Optional dict mapping paragraph hashes to earlier corrections. Paragraphs
+                            found in it are not sent to the model again. After the call it holds
+                            exactly the paragraphs of this text.
+    :return: The corrected text.
+    """
+    store = paragraph_store if paragraph_store is not None else {}
+
+    plan = _plan_correction(text, style, store)
+    corrections = iter(cached_corrections(_plan_prompts(plan, style), batch_size=batch_size))
+    corrected, current_store = _stitch_correction(plan, corrections, store)
+
+    # Forget paragraphs that no longer exist so the store stays as large as the document
+    if paragraph_store is not None:
+        paragraph_store.clear()
+        paragraph_store.update(current_store)
+    return corrected
+
+def correct_pages(pages, style: str, batch_size: int = CORRECTION_BATCH_SIZE, pages_per_window: int = PAGES_PER_WINDOW):
+    """
+    Corrects a document given as an iterable of page texts, e.g. iter_pdf_pages(...).
+    
+    Pages are consumed lazily, pages_per_window at a time. The segments of all pages in a
+    window share batches, and corrected pages are yielded in order as soon as their window
+    is done, so the full document is never held in memory.
+    
+    :param pages: Page texts, in document order.
+    :param style: The writing style to refine the text into.
+    :param batch_size: Number of segments per forward pass.
+    :param pages_per_window: Number of pages corrected together.
+    :return: A generator of corrected page texts.
+    """
+    window = []
+    for page in pages:
+        window.append(page)
+        if len(window) == pages_per_window:
+            yield from _correct_window(window, style, batch_size)
+            window = []
+    if window:
+        yield from _correct_window(window, style, batch_size)
+
+def _correct_window(pages: list, style: str, batch_size: int):
+    """Corrects a few pages with shared batches and yields them in order."""
+    plans = [_plan_correction(page, style, {}) for page in pages]
+    prompts = [prompt for plan in plans for prompt in _plan_prompts(plan, style)]
+    corrections = iter(cached_corrections(prompts, batch_size=batch_size))
+    for plan in plans:
+        yield _stitch_correction(plan, corrections, {})[0]
+
+def _plan_correction(text: str, style: str, store: dict) -> list:
+    """
+    Splits text into paragraphs and segments the ones that are not in the store yet.
+    
+    :return: A list of (paragraph, separator, key, segments) tuples. The key is None for blank
+             paragraphs, and segments is empty for paragraphs that need no model call.
+    """
+    plan, queued = [], set()
+    for paragraph, separator in split_paragraphs(text):
+        key = paragraph_key(paragraph, style) if paragraph.strip() else None
+        segments = []
+        if key and key not in store and key not in queued:
+            queued.add(key)
+            segments = segment_paragraph(paragraph)
+        plan.append((paragraph, separator, key, segments))
+    return plan
+
+def _plan_prompts(plan: list, style: str) -> list:
+    """Returns the model prompts of a correction plan, in order."""
+    instruction = CHUNK_INSTRUCTION.format(style=style.lower())
+    return [instruction + segment for _, _, _, segments in plan for segment in segments]
+
+def _stitch_correction(plan: list, corrections, store: dict) -> tuple:
+    """
+    Rebuilds the corrected text from a plan, consuming one correction per planned segment.
+    
+    :return: The corrected text and a dict of the corrections of its paragraphs.
+    """
+    corrected, current_store = [], {}
+    for paragraph, separator, key, segments in plan:
+        if key is None:
+            corrected.append(paragraph)
+        else:
+            if key not in current_store:
+                if segments:
+                    current_store[key] = " ".join(next(corrections).strip() for _ in segments)
+                else:
+                    current_store[key] = store[key]
+            corrected.append(current_store[key])
+        corrected.append(separator)
+    return "".join(corrected).strip(), current_store
+
+def paragraph_key(paragraph: str, style: str) -> str:
+    """
+    Returns the hash under which a paragraph's correction is stored.
+    
+    :param paragraph: The original paragraph.
+    :param style: The writing style it was corrected into.
+    :return: A hex digest that changes whenever the paragraph, style or segmenting changes.
+    """
+    return make_key(paragraph, CORRECTOR_MODEL, style=style.lower(), segment_tokens=SEGMENT_TOKENS)
+
+def split_paragraphs(text: str) -> list:
+    """
+    Splits text into paragraphs, keeping the line breaks that separated them.
+    
+    :param text: The input text.
+    :return: A list of (paragraph, separator) pairs whose concatenation is the original text.
+    """
+    parts = re.split(r"(\n\s*)", text)
+    parts.append("")
+    return list(zip(parts[0::2], parts[1::2]))
+
+def segment_paragraph(paragraph: str, max_tokens: int = SEGMENT_TOKENS) -> list:
+    """
+    Packs the sentences of one paragraph into segments of at most max_tokens tokens.
+    
+    Sentences are never split unless a single sentence is longer than the budget, in
+    which case it is cut on word boundaries.
+    
+    :param paragraph: A paragraph without line breaks.
+    :param max_tokens: Token budget of one segment, measured with the corrector's tokenizer.
+    :return: A list of segments.
+    """
+    tokenizer = get_corrector().tokenizer
+    sentences = [sentence for sentence in re.split(r"(?<=[.!?])\s+", paragraph.strip()) if sentence]
+    counts = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+
+    segments, current, current_tokens = [], [], 0
+    for sentence, count in zip(sentences, counts):
+        if count > max_tokens:
+            # Too long on its own: flush what we have and cut the sentence on word boundaries
+            if current:
+                segments.append(" ".join(current))
+                current, current_tokens = [], 0
+            segments.extend(_split_long_sentence(sentence, max_tokens, tokenizer))
+            continue
+        if current and current_tokens + count > max_tokens:
+            segments.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += count
+
+    if current:
+        segments.append(" ".join(current))
+    return segments
+
+def _split_long_sentence(sentence: str, max_tokens: int, tokenizer) -> list:
+    """Cuts an over-long sentence into word-aligned pieces of at most max_tokens tokens."""
+    words = sentence.split()
+    counts = [len(ids) for ids in tokenizer(words, add_special_tokens=False)["input_ids"]]
+
+    pieces, current, current_tokens = [], [], 0
+    for word, count in zip(words, counts):
+        if current and current_tokens + count > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += count
+
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def cached_corrections(prompts: list, batch_size: int = CORRECTION_BATCH_SIZE) -> list:
+    """
+    Runs prompts through the corrector, skipping every prompt whose result is already cached.
+    
+    Generation is deterministic (do_sample=False), so results are cached by a hash of the
+    normalized prompt, the model id and the generation settings. Only the misses are
+    batched through the pipeline.
+    
+    :param prompts: Model inputs, instruction included.
+    :param batch_size: Number of prompts per forward pass.
+    :return: The corrected texts, in the order of the prompts.
+    """
+    keys = [make_key(prompt, CORRECTOR_MODEL, **GENERATION_KWARGS) for prompt in prompts]
+    results = [result_cache.get(key) for key in keys]
+
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        outputs = run_pipeline(get_corrector, [prompts[index] for index in missing], batch_size=batch_size, **GENERATION_KWARGS)
+        for index, output in zip(missing, outputs):
+            results[index] = output["generated_text"]
+            result_cache.set(keys[index], results[index])
+
+    return results
+
+def extract_text_from_pdf(pdf_file_path: str, start: int = 0, stop: int = None) -> str:
     """
     Extracts raw text from a PDF file.
     
-    :param pdf_file_path: Path to the PDF file.
+    Use iter_pdf_pages with correct_pages instead to correct a large PDF without holding
+    its full text in memory.
+    
+    :param pdf_file_path: Path to the PDF file, or an uploaded file object.
+    :param start: Index of the first page to extract (0-based).
+    :param stop: Index one past the last page to extract, None for the end of the document.
     :return: Extracted text from the PDF or an error message.
     """
     try:
-        with open(pdf_file_path, "rb") as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
+        text = "\n".join(iter_pdf_pages(pdf_file_path, start, stop))
         return text.strip() if text else "Error: Could not extract text from PDF."
     except Exception as e:
         return f"Error extracting text: {str(e)}"
@@ -94,7 +318,8 @@ def display_menu():
         elif choice in ["2", "3", "4"]:
             file_path = input("\nEnter the file path: ")
             if choice == "2":
-                text = extract_text_from_pdf(file_path)
+                # PDFs are not extracted up front: their pages are streamed into the correction below
+                text = file_path if os.path.isfile(file_path) else f"Error: File not found: {file_path}"
             elif choice == "3":
                 text = extract_text_from_docx(file_path)
             elif choice == "4":
@@ -132,9 +357,22 @@ def display_menu():
 
         # Process text correction
         print("\n🔍 Processing text correction...\n")
-        corrected_text = correct_text(text, style)
-        print("✨ **Corrected Text:**\n")
-        print(corrected_text)
+        if choice == "2":
+            print("✨ **Corrected Text:**\n")
+            corrected_pages, page_timings = [], []
+            try:
+                for page in correct_pages(iter_pdf_pages(file_path, timings=page_timings), style):
+                    print(page)
+                    corrected_pages.append(page)
+            except Exception as e:
+                print(f"❌ Error: {str(e)}")
+                continue
+            corrected_text = "\n".join(corrected_pages)
+            print(f"\n⏱ {format_timings(page_timings)}")
+        else:
+            corrected_text = correct_text(text, style, chunked=True)
+            print("✨ **Corrected Text:**\n")
+            print(corrected_text)
 
         # Save corrected text
         save_choice = input("\n📥 Do you want to save the corrected text? (y/n): ").strip().lower()
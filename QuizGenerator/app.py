@@ -8,8 +8,9 @@ import contextlib
 # Using this approach to avoid module import issues in Streamlit
 from quiz import (
     get_badge, generate_quiz, parse_quiz, 
-    generate_fallback_questions, BADGES
+    generate_fallback_questions, BADGES, quiz_bank
 )
+from quiz_bank import QUIZ_BANK_ENABLED
 
 def main():
     st.set_page_config(
@@ -37,6 +38,11 @@ def main():
         st.session_state.user_details = {}
     if 'score' not in st.session_state:
         st.session_state.score = 0
+    if 'bank_warmed' not in st.session_state:
+        # Pre-generate the popular quizzes in the background (no-op for buckets that are already full)
+        if QUIZ_BANK_ENABLED:
+            quiz_bank.warm()
+        st.session_state.bank_warmed = True
     
     # Application flow
     if st.session_state.step == 'user_info':
@@ -0,0 +1,205 @@
+"""
+Grammar-constrained decoding of quiz questions.
+
+parse_quiz fishes "question / A-D / Answer:" blocks out of free-form gpt2
+text, and every sample that drifts from the format is wasted. The
+QuizFormatLogitsProcessor below runs a small state machine of the format next
+to each row of a generate call and masks the logits so that every row is a
+parseable question:
+
+    QUESTION  free text, ends with a newline right after a "?"
+    OPTION A  "A." (forced), free text, ends with a newline
+    OPTION B  "B." ...
+    OPTION C  "C." ...
+    OPTION D  "D." ...
+    ANSWER    "Answer:" (forced), then one of " A", " B", " C", " D"
+    DONE      end of sequence (or the next question's number)
+
+Inside free text, the model chooses when to end the field by sampling the
+newline token. Other tokens containing a newline and the special tokens are
+masked. A field that reaches its token limit is closed by force. The
+processor tracks rows by index, so it suits sampling and greedy search, not
+beam search. It keeps per-call state, so use a new processor for every
+generate call.
+"""
+
+from functools import lru_cache
+
+import torch
+from transformers import LogitsProcessor
+
+QUESTION_MAX_TOKENS = 40  # Tokens of question text before "?" and the options are forced
+OPTION_MAX_TOKENS = 16  # Tokens of option text before the next field is forced
+
+OPTION_LETTERS = ["A", "B", "C", "D"]
+
+# Field states
+QUESTION, ANSWER, DONE = "question", "answer", "done"
+
+
+class QuizVocabulary:
+    """Token ids and masks of a tokenizer needed by the state machine; built once per tokenizer."""
+
+    def __init__(self, tokenizer):
+        texts = tokenizer.batch_decode([[token_id] for token_id in range(len(tokenizer))])
+        self.size = len(texts)
+        self.newline_id = self._single_token(tokenizer, "\n")
+        self.question_mark_id = self._single_token(tokenizer, "?")
+        self.eos_id = tokenizer.eos_token_id
+        special_ids = set(tokenizer.all_special_ids)
+        # Tokens never allowed inside free text
+        self.newline_mask = torch.tensor(
+            ["\n" in text or token_id in special_ids for token_id, text in enumerate(texts)]
+        )
+        self.ends_question = [text.rstrip().endswith("?") for text in texts]
+        self.has_content = [any(character.isalnum() for character in text) for text in texts]
+        self.markers = {
+            letter: tokenizer.encode(f"{letter}.", add_special_tokens=False) for letter in OPTION_LETTERS
+        }
+        self.answer_prefix = tokenizer.encode("Answer:", add_special_tokens=False)
+        # Letters with and without the leading space, e.g. " A" and "A"
+        self.answer_letters = {}
+        for letter in OPTION_LETTERS:
+            for text in (f" {letter}", letter):
+                ids = tokenizer.encode(text, add_special_tokens=False)
+                if len(ids) == 1:
+                    self.answer_letters[ids[0]] = letter
+
+    @staticmethod
+    def _single_token(tokenizer, text):
+        ids = tokenizer.encode(text, add_special_tokens=False)
+        if len(ids) != 1:
+            raise ValueError(f"Error: {text!r} is not a single token for this tokenizer")
+        return ids[0]
+
+    def number(self, tokenizer, number):
+        """Tokens opening question `number` after a finished one: a blank line and "n."."""
+        return tokenizer.encode(f"\n\n{number}.", add_special_tokens=False)
+
+
+@lru_cache(maxsize=4)
+def get_quiz_vocabulary(tokenizer):
+    """Returns the cached QuizVocabulary of a tokenizer."""
+    return QuizVocabulary(tokenizer)
+
+
+class _RowState:
+    """Position of one row in the quiz format."""
+
+    __slots__ = ("field", "forced", "tokens", "ends_question", "has_content", "question")
+
+    def __init__(self):
+        self.forced = []
+        self.question = 1
+        self.start_field(QUESTION)
+
+    def start_field(self, field):
+        self.field = field
+        self.tokens = 0
+        self.ends_question = False
+        self.has_content = False
+
+
+class QuizFormatLogitsProcessor(LogitsProcessor):
+    """
+    Forces the quiz format on every row of a generate call.
+
+    The prompt must end where a question's text starts, e.g. after "1.".
+
+    :param tokenizer: Tokenizer of the model.
+    :param num_questions: Questions per row. After the last answer the row is ended with the eos token;
+                          before it, the next question's number is forced.
+    :param question_max_tokens: Limit of the question text.
+    :param option_max_tokens: Limit of each option's text.
+    """
+
+    def __init__(self, tokenizer, num_questions=1, question_max_tokens=QUESTION_MAX_TOKENS,
+                 option_max_tokens=OPTION_MAX_TOKENS):
+        self.tokenizer = tokenizer
+        self.vocab = get_quiz_vocabulary(tokenizer)
+        self.num_questions = num_questions
+        self.question_max_tokens = question_max_tokens
+        self.option_max_tokens = option_max_tokens
+        self._prompt_length = None
+        self._rows = []
+
+    def _next_field(self, field):
+        if field == QUESTION:
+            return OPTION_LETTERS[0]
+        if field in OPTION_LETTERS[:-1]:
+            return OPTION_LETTERS[OPTION_LETTERS.index(field) + 1]
+        return ANSWER
+
+    def _close_field(self, row):
+        """Queues the tokens opening the next field after the newline ending the current one."""
+        following = self._next_field(row.field)
+        row.forced.extend(self.vocab.answer_prefix if following == ANSWER else self.vocab.markers[following])
+        row.start_field(following)
+
+    def _advance(self, row, token_id):
+        """Updates a row's state with the token it just generated."""
+        if row.forced:
+            row.forced.pop(0)
+            return
+        if row.field == DONE:
+            return
+        if row.field == ANSWER:
+            if row.question < self.num_questions:
+                row.question += 1
+                row.forced.extend(self.vocab.number(self.tokenizer, row.question))
+                row.start_field(QUESTION)
+            else:
+                row.start_field(DONE)
+            return
+        if token_id == self.vocab.newline_id:
+            self._close_field(row)
+            return
+        row.tokens += 1
+        row.ends_question = self.vocab.ends_question[token_id]
+        row.has_content |= self.vocab.has_content[token_id]
+        limit = self.question_max_tokens if row.field == QUESTION else self.option_max_tokens
+        if row.tokens >= limit:
+            # Too long: end the field by force (a question also gets its "?")
+            if row.field == QUESTION and not row.ends_question:
+                row.forced.append(self.vocab.question_mark_id)
+            row.forced.append(self.vocab.newline_id)
+            self._close_field(row)
+
+    def _can_end_field(self, row):
+        if row.field == QUESTION:
+            return row.ends_question
+        return row.has_content
+
+    def __call__(self, input_ids, scores):
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1]
+            self._rows = [_RowState() for _ in range(input_ids.shape[0])]
+        elif input_ids.shape[1] > self._prompt_length:
+            for row, token_id in zip(self._rows, input_ids[:, -1].tolist()):
+                self._advance(row, token_id)
+
+        newline_mask = self.vocab.newline_mask.to(scores.device)
+        if newline_mask.shape[0] < scores.shape[1]:
+            # The embedding matrix may be larger than the tokenizer's vocabulary
+            newline_mask = torch.cat([newline_mask, newline_mask.new_zeros(scores.shape[1] - newline_mask.shape[0])])
+        newline_mask = newline_mask[:scores.shape[1]]
+
+        for index, row in enumerate(self._rows):
+            row_scores = scores[index]
+            if row.forced or row.field == DONE:
+                token_id = row.forced[0] if row.forced else self.vocab.eos_id
+                kept = row_scores[token_id].clone()
+                row_scores.fill_(-float("inf"))
+                # The forced token gets a finite score whatever the model thought of it
+                row_scores[token_id] = kept if torch.isfinite(kept) else 0.0
+            elif row.field == ANSWER:
+                letters = list(self.vocab.answer_letters)
+                kept = row_scores[letters].clone()
+                row_scores.fill_(-float("inf"))
+                row_scores[letters] = torch.where(torch.isfinite(kept), kept, torch.zeros_like(kept))
+            else:
+                newline_score = row_scores[self.vocab.newline_id].clone()
+                row_scores.masked_fill_(newline_mask, -float("inf"))
+                if self._can_end_field(row):
+                    row_scores[self.vocab.newline_id] = newline_score
+        return scores
\ No newline at end of file
@@ -1,12 +1,37 @@
+import os
 import re
-from transformers import pipeline
+import sys
 
-# **Load a Better Model for Quiz Generation**
-try:
-    quiz_generator = pipeline("text-generation", model="gpt2-medium")
-except Exception as e:
-    print(f"Error loading model: {str(e)}")
-    exit(1)
+import torch
+from transformers import LogitsProcessorList, StoppingCriteria, StoppingCriteriaList
+
+from constrained import QuizFormatLogitsProcessor
+from quiz_bank import QUIZ_BANK_ENABLED, QuizBank
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.registry import get_pipeline
+from shared.speculative import run_speculative
+
+# **Better Model for Quiz Generation (shared with the recipe generator, loaded on first use)**
+MODEL_NAME = "gpt2-medium"
+
+def get_quiz_generator():
+    """Returns the shared text-generation pipeline used for quizzes."""
+    return get_pipeline("text-generation", model=MODEL_NAME)
+
+# **Quiz generation settings**
+# "single" (default) samples the whole quiz as one 600-token sequence; "batched" (opt-in) samples one
+# short sequence per question in a single generate call and resamples only the rows that fail to parse.
+QUIZ_GENERATION_MODE = os.environ.get("QUIZ_GENERATION_MODE", "single").lower()
+QUIZ_QUESTIONS = 10
+QUESTION_MAX_NEW_TOKENS = 128  # Covers the longest constrained question (see constrained.py limits)
+QUIZ_MAX_ROUNDS = 3  # Batched generate calls before the missing questions come from the fallback
+# Force the question format during batched decoding (see constrained.py), so every row parses.
+# Only used in "batched" mode and by quiz bank refills; the default "single" mode is unconstrained.
+QUIZ_CONSTRAINED = os.environ.get("QUIZ_CONSTRAINED", "1").lower() in ("1", "true", "yes")
+
+ANSWER_PATTERN = re.compile(r"Answer:\s*[A-D]")
+QUESTION_NUMBER_PATTERN = re.compile(r"^\d+\.\s*")
 
 # **Badge hierarchy based on quiz score**
 BADGES = [
@@ -57,11 +82,17 @@ def get_user_role(field):
         return f"Professional in {field}"
     return role
 
-def generate_quiz(user, field, role):
-    """Generates a 10-question quiz using AI, considering personal details."""
-    prompt = (
-        f"Generate a 10-question multiple-choice quiz for {user['name']}, a {user['age']}-year-old from {user['country']}. "
-        f"{user['name']} is a {role} in the {field} field. "
+def build_quiz_prompt(user, field, role):
+    """Builds the quiz generation prompt for a user, or a generic one for the (field, role) if user is None."""
+    if user is None:
+        audience = f"Generate a 10-question multiple-choice quiz for a {role} in the {field} field. "
+    else:
+        audience = (
+            f"Generate a 10-question multiple-choice quiz for {user['name']}, a {user['age']}-year-old from {user['country']}. "
+            f"{user['name']} is a {role} in the {field} field. "
+        )
+    return (
+        audience +
         f"Make the questions engaging and technically relevant to their profession. "
         f"Format each question as:\n"
         f"1. Question text?\n"
@@ -73,20 +104,117 @@ def generate_quiz(user, field, role):
         f"Always provide exactly 4 options (A, B, C, D) for each question."
     )
 
+class QuestionComplete(StoppingCriteria):
+    """Stops every row of a batch as soon as it contains an answer line, i.e. a complete question."""
+
+    def __init__(self, tokenizer, prompt_length):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids, scores, **kwargs):
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        return torch.tensor([bool(ANSWER_PATTERN.search(text)) for text in texts], device=input_ids.device)
+
+def number_questions(questions):
+    """Numbers questions 1..n, replacing the number the model or the fallback gave them."""
+    return [
+        dict(question, question=f"{index}. {QUESTION_NUMBER_PATTERN.sub('', question['question'])}")
+        for index, question in enumerate(questions, 1)
+    ]
+
+def generate_questions_batched(prompt, count=QUIZ_QUESTIONS, max_rounds=QUIZ_MAX_ROUNDS):
+    """
+    Samples questions as a batch of short, independent sequences.
+
+    Every round is one generate call with one row per missing question. The prompt ends with
+    "1.", so each row starts a question; a row stops as soon as it has an answer line.
+    Rows that parse into a new question are kept and only the others are sampled again.
+    With QUIZ_CONSTRAINED, a QuizFormatLogitsProcessor makes every row follow the format, so
+    rows only fail as duplicates.
+
+    :param prompt: The quiz prompt.
+    :param count: Number of questions wanted.
+    :param max_rounds: Maximum number of generate calls.
+    :return: Up to `count` parsed questions.
+    """
+    seeded_prompt = f"{prompt}\n\n1."
+    tokenizer = get_quiz_generator().tokenizer
+    stopping = StoppingCriteriaList([QuestionComplete(tokenizer, len(tokenizer(seeded_prompt)["input_ids"]))])
+
+    questions = []
+    seen = set()
+    for _ in range(max_rounds):
+        missing = count - len(questions)
+        if missing <= 0:
+            break
+        extra_kwargs = {}
+        if QUIZ_CONSTRAINED:
+            # The processor tracks the rows of one generate call, so every round gets a new one
+            extra_kwargs["logits_processor"] = LogitsProcessorList([QuizFormatLogitsProcessor(tokenizer)])
+        # Several rows, or the constrained processor, cannot be assisted: run_speculative then runs the plain pipeline
+        outputs = run_speculative(
+            get_quiz_generator,
+            seeded_prompt,
+            name="quiz",
+            num_return_sequences=missing,
+            return_full_text=False,
+            max_new_tokens=QUESTION_MAX_NEW_TOKENS,
+            temperature=0.7,
+            top_p=0.9,
+            do_sample=True,
+            pad_token_id=tokenizer.eos_token_id,
+            stopping_criteria=stopping,
+            **extra_kwargs
+        )
+        for output in outputs:
+            parsed = parse_quiz("1." + output["generated_text"])
+            if parsed and parsed[0]["question"].lower() not in seen:
+                seen.add(parsed[0]["question"].lower())
+                questions.append(parsed[0])
+    return questions[:count]
+
+def generate_bank_questions(field, role, count):
+    """Generates generic questions for a (field, role) bucket of the quiz bank."""
+    return generate_questions_batched(build_quiz_prompt(None, field, role), count=count)
+
+# **Quiz bank (pre-generated questions per field and role, refilled in the background)**
+quiz_bank = QuizBank(generate_bank_questions)
+
+def generate_quiz(user, field, role):
+    """Generates a 10-question quiz using AI, considering personal details."""
+    # Serve from the quiz bank when it holds enough questions the user has not seen yet
+    banked = quiz_bank.take(field, role, user, QUIZ_QUESTIONS) if QUIZ_BANK_ENABLED else []
+    if len(banked) == QUIZ_QUESTIONS:
+        return number_questions(banked)
+
+    prompt = build_quiz_prompt(user, field, role)
+
     try:
-        response = quiz_generator(prompt, max_length=600, temperature=0.7, top_p=0.9, do_sample=True)
-        quiz_text = response[0]["generated_text"]
-        questions = parse_quiz(quiz_text)
+        # Bank refills wait while the quiz is generated live, so the two never decode at the same time
+        with quiz_bank.live_generation():
+            if QUIZ_GENERATION_MODE == "single":
+                response = run_speculative(
+                    get_quiz_generator, prompt, name="quiz", max_length=600, temperature=0.7, top_p=0.9, do_sample=True
+                )
+                quiz_text = response[0]["generated_text"]
+                questions = parse_quiz(quiz_text)
+            else:
+                questions = generate_questions_batched(prompt, count=QUIZ_QUESTIONS - len(banked))
+        questions = (banked + questions)[:QUIZ_QUESTIONS]
         
         if len(questions) < 5:
             fallback_questions = generate_fallback_questions(field, role)
             questions.extend(fallback_questions)
             questions = questions[:10]  # Limit to 10 questions maximum
             
-        return questions
+        return number_questions(questions)
     except Exception as e:
         print(f"❌ Error generating quiz: {str(e)}")
-        return generate_fallback_questions(field, role)
+        return number_questions(banked + generate_fallback_questions(field, role))
+    finally:
+        if QUIZ_BANK_ENABLED:
+            # The miss has been served live: top the bucket up in the background now
+            quiz_bank.schedule_refill(field, role)
 
 def parse_quiz(quiz_text):
     """Extracts structured questions from AI-generated text."""
@@ -0,0 +1,328 @@
+"""
+Precomputed quiz bank with background pre-generation per (field, role).
+
+Every "Generate My Quiz" click used to wait on a full gpt2-medium decode. The
+bank keeps validated questions per (field, role) bucket in a local SQLite
+store. generate_quiz serves from it instantly, sampling questions the user has
+not been served yet. When a bucket runs low, a background worker pool generates
+and validates more. Popular pairs (QUIZ_BANK_POPULAR plus the most requested
+buckets) can be pre-generated at start-up with warm(), or ahead of time with:
+
+    python quiz_bank.py "IT:Software Developer" "Medicine:Doctor"
+
+Banked questions are generic to the (field, role): they do not mention the
+user's name, age or country the way a live quiz prompt does. The bank is
+opt-in (QUIZ_BANK=1).
+
+Refills share the gpt2-medium pipeline with live quizzes. They never decode
+at the same time: live generation runs inside live_generation(), and a refill
+generates REFILL_CHUNK_QUESTIONS at a time, each chunk only once no live
+generation is running or waiting. A live request therefore waits for at most
+one chunk, and only while a refill is pending; live requests never wait for
+each other. A miss does not start a refill while it is served live; the caller
+schedules it afterwards.
+
+metrics() reports the hit rate (quizzes served entirely from the bank), the
+refill lag (time from a refill request to its questions being in the bank) and
+the size of every bucket.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+# **Quiz bank settings (overridable through environment variables)**
+QUIZ_BANK_ENABLED = os.environ.get("QUIZ_BANK", "").lower() in ("1", "true", "yes")
+QUIZ_BANK_PATH = os.environ.get("QUIZ_BANK_PATH", os.path.join("quiz_bank", "questions.sqlite"))
+QUIZ_BANK_WORKERS = int(os.environ.get("QUIZ_BANK_WORKERS", 1))  # Background generation threads
+QUIZ_BANK_POPULAR = os.environ.get(
+    "QUIZ_BANK_POPULAR", "IT:Software Developer,Medicine:Doctor,Finance:Data Analyst,Sports:Coach"
+)  # "field:role" pairs pre-generated by warm()
+LOW_WATERMARK = 30  # A bucket with fewer questions is refilled
+REFILL_QUESTIONS = 20  # Questions generated per refill
+REFILL_CHUNK_QUESTIONS = 5  # Questions generated per turn on the model; live quizzes wait for at most one chunk
+MAX_BUCKET_QUESTIONS = 500  # Buckets are not grown beyond this for users who have seen everything
+WARM_TOP_BUCKETS = 5  # Most requested buckets also pre-generated by warm()
+
+
+def bucket_key(field, role):
+    """Normalized key of a (field, role) pair."""
+    return f"{' '.join(field.lower().split())}|{' '.join(role.lower().split())}"
+
+
+def user_key(user):
+    """Key identifying a user for sampling without repeats."""
+    return "|".join(str(user.get(name, "")).strip().lower() for name in ("name", "age", "country"))
+
+
+def parse_pairs(text):
+    """Parses "field:role,field:role" into a list of (field, role) pairs."""
+    pairs = []
+    for item in text.split(","):
+        field, separator, role = item.partition(":")
+        if field.strip() and separator and role.strip():
+            pairs.append((field.strip(), role.strip()))
+    return pairs
+
+
+class QuizBank:
+    """
+    SQLite bank of validated quiz questions per (field, role), refilled in the background.
+
+    :param generate: Callable (field, role, count) returning up to `count` parsed questions.
+    :param path: SQLite file.
+    :param workers: Number of background generation threads.
+    :param low_watermark: Bucket size under which a refill is scheduled.
+    :param refill_questions: Questions generated per refill.
+    """
+
+    def __init__(self, generate, path=QUIZ_BANK_PATH, workers=QUIZ_BANK_WORKERS, low_watermark=LOW_WATERMARK,
+                 refill_questions=REFILL_QUESTIONS):
+        self.generate = generate
+        self.path = path
+        self.workers = workers
+        self.low_watermark = low_watermark
+        self.refill_questions = refill_questions
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._executor = None
+        self._pending = {}  # bucket key -> time the refill was requested
+        self._pending_lock = threading.Lock()
+        self._lags = deque(maxlen=100)  # Seconds from refill request to completion
+        self._generation_lock = threading.Lock()  # Held by whoever decodes: a live quiz or a refill chunk
+        self._idle = threading.Condition()
+        self._live = 0  # Live generations running or waiting for the model
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_errors = 0
+
+    def _connection(self):
+        with self._db_lock:
+            if self._db is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.executescript(
+                    "CREATE TABLE IF NOT EXISTS questions ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, bucket TEXT NOT NULL, question TEXT NOT NULL, "
+                    "options TEXT NOT NULL, answer TEXT NOT NULL, created REAL NOT NULL, UNIQUE (bucket, question));"
+                    "CREATE TABLE IF NOT EXISTS served ("
+                    "user_key TEXT NOT NULL, question_id INTEGER NOT NULL, served REAL NOT NULL, "
+                    "PRIMARY KEY (user_key, question_id));"
+                    "CREATE TABLE IF NOT EXISTS buckets ("
+                    "bucket TEXT PRIMARY KEY, field TEXT NOT NULL, role TEXT NOT NULL, "
+                    "requests INTEGER NOT NULL DEFAULT 0, last_requested REAL);"
+                )
+                self._db.commit()
+            return self._db
+
+    def _execute(self, sql, parameters=(), many=False):
+        db = self._connection()
+        with self._db_lock:
+            with db:
+                if many:
+                    return db.executemany(sql, parameters).fetchall()
+                return db.execute(sql, parameters).fetchall()
+
+    # **Serving**
+
+    def bucket_size(self, field, role):
+        return self._execute("SELECT COUNT(*) FROM questions WHERE bucket = ?", (bucket_key(field, role),))[0][0]
+
+    def take(self, field, role, user, count):
+        """
+        Returns up to `count` banked questions the user has not been served, and marks them as served.
+
+        When every question is served, schedules a refill if the bucket is low or the user is running
+        out of unseen questions. When fewer are served, the caller generates the rest live and should
+        call schedule_refill afterwards. A user who has seen a full bucket starts over.
+
+        :param user: User details dict (see user_key) or a user key string.
+        """
+        bucket = bucket_key(field, role)
+        key = user if isinstance(user, str) else user_key(user)
+        self._execute(
+            "INSERT INTO buckets (bucket, field, role, requests, last_requested) VALUES (?, ?, ?, 1, ?) "
+            "ON CONFLICT (bucket) DO UPDATE SET requests = requests + 1, last_requested = excluded.last_requested",
+            (bucket, field, role, time.time())
+        )
+        unseen_sql = (
+            "SELECT id, question, options, answer FROM questions WHERE bucket = ? AND id NOT IN "
+            "(SELECT question_id FROM served WHERE user_key = ?) ORDER BY RANDOM() LIMIT ?"
+        )
+        rows = self._execute(unseen_sql, (bucket, key, count))
+        size = self.bucket_size(field, role)
+        if len(rows) < count and size >= MAX_BUCKET_QUESTIONS:
+            # Seen it all and the bucket will not grow: start over
+            self._execute(
+                "DELETE FROM served WHERE user_key = ? AND question_id IN (SELECT id FROM questions WHERE bucket = ?)",
+                (key, bucket)
+            )
+            rows = self._execute(unseen_sql, (bucket, key, count))
+
+        now = time.time()
+        self._execute(
+            "INSERT OR IGNORE INTO served (user_key, question_id, served) VALUES (?, ?, ?)",
+            [(key, row[0], now) for row in rows],
+            many=True
+        )
+        if len(rows) == count:
+            self.hits += 1
+        elif rows:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+
+        unseen_left = self._execute(
+            "SELECT COUNT(*) FROM questions WHERE bucket = ? AND id NOT IN "
+            "(SELECT question_id FROM served WHERE user_key = ?)",
+            (bucket, key)
+        )[0][0]
+        if len(rows) == count and (
+            size < self.low_watermark or (unseen_left < count and size < MAX_BUCKET_QUESTIONS)
+        ):
+            self.schedule_refill(field, role)
+        return [{"question": row[1], "options": json.loads(row[2]), "answer": row[3]} for row in rows]
+
+    # **Refilling**
+
+    @contextmanager
+    def live_generation(self):
+        """
+        Context manager around a live quiz generation: keeps refills waiting.
+
+        The model is only locked while a refill is queued or running. Otherwise (always when the
+        bank is off) live generations do not wait for each other and can be batched together.
+        """
+        with self._idle:
+            self._live += 1
+        # Counted as live first: a refill queued from now on waits for this generation to finish
+        with self._pending_lock:
+            refilling = bool(self._pending)
+        try:
+            with self._generation_lock if refilling else nullcontext():
+                yield
+        finally:
+            with self._idle:
+                self._live -= 1
+                self._idle.notify_all()
+
+    def _generate_chunk(self, field, role, count):
+        """Generates one refill chunk once no live generation is running or waiting."""
+        while True:
+            with self._idle:
+                self._idle.wait_for(lambda: self._live == 0)
+            with self._generation_lock:
+                # A live request may have arrived in between: let it go first
+                with self._idle:
+                    if self._live:
+                        continue
+                return self.generate(field, role, count)
+
+    def add(self, field, role, questions):
+        """Stores validated questions in a bucket, skipping duplicates. Returns the number added."""
+        bucket = bucket_key(field, role)
+        before = self.bucket_size(field, role)
+        now = time.time()
+        self._execute(
+            "INSERT OR IGNORE INTO questions (bucket, question, options, answer, created) VALUES (?, ?, ?, ?, ?)",
+            [
+                (bucket, question["question"], json.dumps(question["options"]), question["answer"], now)
+                for question in questions
+                if len(question.get("options", [])) == 4 and question.get("answer") in ("A", "B", "C", "D")
+            ],
+            many=True
+        )
+        return self.bucket_size(field, role) - before
+
+    def schedule_refill(self, field, role):
+        """Queues a background refill of a bucket, unless one is pending or it is full. Returns its Future or None."""
+        bucket = bucket_key(field, role)
+        if self.bucket_size(field, role) >= MAX_BUCKET_QUESTIONS:
+            return None
+        with self._pending_lock:
+            if bucket in self._pending:
+                return None
+            self._pending[bucket] = time.monotonic()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="quiz-bank")
+            return self._executor.submit(self._refill, field, role)
+
+    def _refill(self, field, role):
+        bucket = bucket_key(field, role)
+        try:
+            added = 0
+            for start in range(0, self.refill_questions, REFILL_CHUNK_QUESTIONS):
+                count = min(REFILL_CHUNK_QUESTIONS, self.refill_questions - start)
+                added += self.add(field, role, self._generate_chunk(field, role, count))
+            return added
+        except Exception as e:
+            self.refill_errors += 1
+            print(f"❌ Error refilling quiz bank for {field} / {role}: {str(e)}")
+            return 0
+        finally:
+            with self._pending_lock:
+                requested = self._pending.pop(bucket, None)
+            if requested is not None:
+                self._lags.append(time.monotonic() - requested)
+                self.refills += 1
+
+    def popular_pairs(self, limit=WARM_TOP_BUCKETS):
+        """The most requested (field, role) pairs."""
+        return self._execute("SELECT field, role FROM buckets ORDER BY requests DESC LIMIT ?", (limit,))
+
+    def warm(self, pairs=None):
+        """Schedules refills of the popular buckets that are below the low watermark. Returns their Futures."""
+        pairs = list(parse_pairs(QUIZ_BANK_POPULAR) if pairs is None else pairs)
+        pairs += [tuple(pair) for pair in self.popular_pairs()]
+        futures = []
+        for field, role in dict.fromkeys(pairs):
+            if self.bucket_size(field, role) < self.low_watermark:
+                future = self.schedule_refill(field, role)
+                if future is not None:
+                    futures.append(future)
+        return futures
+
+    def metrics(self):
+        """Returns hit rate, refill lag and bucket sizes."""
+        served = self.hits + self.partial_hits + self.misses
+        lags = sorted(self._lags)
+        with self._pending_lock:
+            pending = len(self._pending)
+        buckets = self._execute("SELECT bucket, COUNT(*) FROM questions GROUP BY bucket")
+        return {
+            "quizzes": served,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / served if served else 0.0,
+            "refills": self.refills,
+            "refill_errors": self.refill_errors,
+            "pending_refills": pending,
+            "mean_refill_lag_seconds": sum(lags) / len(lags) if lags else 0.0,
+            "p95_refill_lag_seconds": lags[int(0.95 * (len(lags) - 1))] if lags else 0.0,
+            "bucket_sizes": dict(buckets)
+        }
+
+
+def main():
+    from quiz import quiz_bank
+
+    pairs = parse_pairs(",".join(sys.argv[1:])) if len(sys.argv) > 1 else None
+    for future in quiz_bank.warm(pairs):
+        future.result()
+    print(json.dumps(quiz_bank.metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,7 +1,7 @@
 import streamlit as st
 import os
 # Import functions from the recipe.py module
-from recipe import generate_recipe, get_dish_details, save_recipe, MODEL_NAME
+from recipe import stream_recipe, get_dish_details, save_recipe, MODEL_NAME
 
 # Set Page Configuration
 st.set_page_config(
@@ -74,18 +74,17 @@ if option == "🍲 Create a New Recipe":
     
     # Generate Recipe
     if generate_button:
-        with st.spinner("👨‍🍳 Cooking up your AI-powered recipe..."):
-            nutrition_str = ", ".join(nutrition_focus) if nutrition_focus else "Balanced"
-            recipe_input = f"{ingredients} with {complexity} complexity and focus on {nutrition_str}"
-            recipe = generate_recipe(recipe_input, diet, meal_type, cooking_time, servings)
+        nutrition_str = ", ".join(nutrition_focus) if nutrition_focus else "Balanced"
+        recipe_input = f"{ingredients} with {complexity} complexity and focus on {nutrition_str}"
         
-        st.success("Recipe created successfully!")
         st.subheader("✨ Your AI-Generated Recipe")
         
-        # Display Recipe
+        # Display Recipe while it is being written
         recipe_container = st.container()
         with recipe_container:
-            st.markdown(recipe)
+            recipe = st.write_stream(stream_recipe(recipe_input, diet, meal_type, cooking_time, servings)).strip()
+        
+        st.success("Recipe created successfully!")
         
         # Save Recipe Options
         st.subheader("💾 Save Your Recipe")
@@ -1,28 +1,30 @@
-from transformers import pipeline
+import os
+import sys
 from docx import Document
 from fpdf import FPDF
 
-# **Load Hugging Face Model (Fast & Efficient)**
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.registry import get_pipeline
+from shared.speculative import run_speculative
+from shared.streaming import stream_generate
+
+# **Hugging Face Model (Fast & Efficient), loaded on first use**
 MODEL_NAME = "gpt2-medium"
-recipe_generator = pipeline("text-generation", model=MODEL_NAME)
+
+def get_recipe_generator():
+    """Returns the shared text-generation pipeline used for recipes."""
+    return get_pipeline("text-generation", model=MODEL_NAME)
 
 def generate_recipe(ingredients, diet, meal_type, cooking_time, servings):
     """
     Generates a detailed recipe based on user input using an optimized prompt.
     """
-    prompt = (
-        f"Write a detailed {meal_type} recipe using these ingredients: {ingredients}. "
-        f"The recipe should follow a {diet} diet, take around {cooking_time} minutes, and serve {servings} people.\n\n"
-        f"### Recipe Format:\n"
-        f"- **Title**: A unique and appealing name.\n"
-        f"- **Ingredients**: Clearly list all required ingredients.\n"
-        f"- **Preparation Steps**: Provide detailed step-by-step cooking instructions.\n"
-        f"- **Chef’s Tips**: Share cooking hacks or variations.\n"
-        f"- **Nutritional Information**: Calories, protein, carbs, fats.\n"
-    )
+    prompt = build_recipe_prompt(ingredients, diet, meal_type, cooking_time, servings)
 
     try:
-        response = recipe_generator(prompt, max_length=400, temperature=0.7, top_p=0.9)
+        response = run_speculative(
+            get_recipe_generator, prompt, name="recipe", max_length=400, temperature=0.7, top_p=0.9
+        )
         return response[0]["generated_text"].strip()
     except Exception as e:
         return f"❌ Error: {str(e)}"
@@ -34,11 +36,40 @@ def get_dish_details(dish_name):
     prompt = f"Write a complete recipe for {dish_name}."
 
     try:
-        response = recipe_generator(prompt, max_length=400, temperature=0.7, top_p=0.9)
+        response = run_speculative(get_recipe_generator, prompt, name="dish", max_length=400, temperature=0.7, top_p=0.9)
         return response[0]["generated_text"].strip()
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
+def stream_recipe(ingredients, diet, meal_type, cooking_time, servings):
+    """
+    Streaming variant of generate_recipe that yields the recipe as it is generated.
+    """
+    prompt = build_recipe_prompt(ingredients, diet, meal_type, cooking_time, servings)
+
+    try:
+        # The text-generation pipeline samples by default for GPT-2, so generate has to be told explicitly
+        yield from stream_generate(
+            get_recipe_generator(), prompt, max_length=400, temperature=0.7, top_p=0.9, do_sample=True
+        )
+    except Exception as e:
+        yield f"❌ Error: {str(e)}"
+
+def build_recipe_prompt(ingredients, diet, meal_type, cooking_time, servings):
+    """
+    Builds the recipe prompt shared by generate_recipe and stream_recipe.
+    """
+    return (
+        f"Write a detailed {meal_type} recipe using these ingredients: {ingredients}. "
+        f"The recipe should follow a {diet} diet, take around {cooking_time} minutes, and serve {servings} people.\n\n"
+        f"### Recipe Format:\n"
+        f"- **Title**: A unique and appealing name.\n"
+        f"- **Ingredients**: Clearly list all required ingredients.\n"
+        f"- **Preparation Steps**: Provide detailed step-by-step cooking instructions.\n"
+        f"- **Chef’s Tips**: Share cooking hacks or variations.\n"
+        f"- **Nutritional Information**: Calories, protein, carbs, fats.\n"
+    )
+
 def save_recipe(text):
     """
     Saves the generated recipe in different formats.
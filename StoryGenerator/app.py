@@ -7,7 +7,7 @@ import base64
 
 # Import functions from story.py
 try:
-    from story import generate_story
+    from story import stream_story
 except ImportError:
     st.error("Could not import from story.py. Make sure the file is in the same directory.")
     st.stop()
@@ -52,6 +52,17 @@ def save_story_to_file(text, file_format, filename):
     except Exception as e:
         return False, f"Error saving file: {str(e)}"
 
+def write_story_stream(theme, genre, input_words, length):
+    """
+    Renders the story token by token while it is generated and returns the full text.
+    The streamed preview is cleared afterwards so the story box below can show the result.
+    """
+    placeholder = st.empty()
+    with placeholder.container():
+        story = st.write_stream(stream_story(theme, genre, input_words, length))
+    placeholder.empty()
+    return story
+
 def get_download_link(text, filename):
     """Generate a link to download the text as a file"""
     b64 = base64.b64encode(text.encode()).decode()
@@ -130,12 +141,11 @@ def main():
             generate_button = st.form_submit_button("Generate Story")
             
         if generate_button:
-            with st.spinner("✨ Creating your story..."):
-                # Call the generate_story function from story.py
-                story = generate_story(theme, genre, input_words, length)
-                
-                # Store the story in session state to keep it when regenerating
-                st.session_state.current_story = story
+            # Stream the story from story.py so the first words appear right away
+            story = write_story_stream(theme, genre, input_words, length)
+            
+            # Store the story in session state to keep it when regenerating
+            st.session_state.current_story = story
         
         # Display story if available
         if 'current_story' in st.session_state:
@@ -149,10 +159,9 @@ def main():
             
             with col1:
                 if st.button("Regenerate Story"):
-                    with st.spinner("🔄 Regenerating your story..."):
-                        story = generate_story(theme, genre, input_words, length)
-                        st.session_state.current_story = story
-                        st.experimental_rerun()
+                    story = write_story_stream(theme, genre, input_words, length)
+                    st.session_state.current_story = story
+                    st.experimental_rerun()
             
             # Save options
             with col2:
@@ -191,11 +200,10 @@ def main():
             start_button = st.form_submit_button("Start Story")
         
         if start_button:
-            with st.spinner("✨ Creating story opening..."):
-                # Generate the initial part of the story
-                initial_story = generate_story(theme, genre, input_words, 150)
-                st.session_state.initial_story = initial_story
-                st.session_state.theme = theme
+            # Generate the initial part of the story
+            initial_story = write_story_stream(theme, genre, input_words, 150)
+            st.session_state.initial_story = initial_story
+            st.session_state.theme = theme
         
         # Display initial story and allow user to continue
         if 'initial_story' in st.session_state:
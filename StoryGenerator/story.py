@@ -1,9 +1,19 @@
-from transformers import pipeline
+import os
+import sys
 from docx import Document
 from fpdf import FPDF
 
-# Load a Hugging Face model for story generation
-story_generator = pipeline("text-generation", model="distilgpt2")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.batching import run_pipeline
+from shared.registry import get_pipeline
+from shared.streaming import stream_generate
+
+# Hugging Face model for story generation, loaded on first use
+MODEL_NAME = "distilgpt2"
+
+def get_story_generator():
+    """Returns the shared text-generation pipeline used for stories."""
+    return get_pipeline("text-generation", model=MODEL_NAME)
 
 def generate_story(theme: str, genre: str, input_words: str, length: int) -> str:
     """
@@ -18,8 +28,48 @@ def generate_story(theme: str, genre: str, input_words: str, length: int) -> str
     if not theme or not genre or not input_words or length < 50:
         return "Error: Please provide a valid theme, genre, input words, and a minimum length of 50 words."
 
+    prompt = build_story_prompt(theme, genre, input_words)
+
+    try:
+        story = run_pipeline(get_story_generator, prompt, max_length=length, temperature=0.8, top_p=0.95, do_sample=True)
+        return story[0]["generated_text"]
+    except Exception as e:
+        return f"Error generating story: {str(e)}"
+
+def stream_story(theme: str, genre: str, input_words: str, length: int):
+    """
+    Streaming variant of generate_story that yields the story as it is generated.
+
+    :param theme: The central theme of the story.
+    :param genre: The story genre.
+    :param input_words: Key words or a sentence to guide the story.
+    :param length: Maximum length of the generated story (user-defined).
+    :return: A generator of text pieces whose concatenation equals generate_story's output.
+    """
+    if not theme or not genre or not input_words or length < 50:
+        yield "Error: Please provide a valid theme, genre, input words, and a minimum length of 50 words."
+        return
+
+    prompt = build_story_prompt(theme, genre, input_words)
+
+    try:
+        yield from stream_generate(
+            get_story_generator(), prompt, max_length=length, temperature=0.8, top_p=0.95, do_sample=True
+        )
+    except Exception as e:
+        yield f"Error generating story: {str(e)}"
+
+def build_story_prompt(theme: str, genre: str, input_words: str) -> str:
+    """
+    Builds the storytelling prompt shared by generate_story and stream_story.
+
+    :param theme: The central theme of the story.
+    :param genre: The story genre.
+    :param input_words: Key words or a sentence to guide the story.
+    :return: The prompt text.
+    """
     # Optimized storytelling prompt
-    prompt = (
+    return (
         f"Write a captivating {genre.lower()} story with the theme of {theme.lower()}. "
         f"Ensure the story has a structured format: an engaging opening, a gripping middle, and a satisfying conclusion. "
         f"Incorporate the following elements: {input_words}. "
@@ -28,12 +78,6 @@ def generate_story(theme: str, genre: str, input_words: str, length: int) -> str
         f"Once upon a time, "
     )
 
-    try:
-        story = story_generator(prompt, max_length=length, temperature=0.8, top_p=0.95, do_sample=True)
-        return story[0]["generated_text"]
-    except Exception as e:
-        return f"Error generating story: {str(e)}"
-
 def save_story(text: str):
     """
     Allows the user to choose how they want to save the story.
@@ -1,10 +1,13 @@
 import streamlit as st
 import os
+from itertools import islice
 
 # Import the functions from your existing file
 from summarizer import (
     summarize_text, 
-    extract_text_from_pdf, 
+    summarize_pages,
+    iter_pdf_pages,
+    format_timings,
     extract_text_from_docx, 
     fetch_text_from_url
 )
@@ -27,6 +30,10 @@ tab1, tab2, tab3 = st.tabs(["Text Input", "File Upload", "URL"])
 input_text = ""
 is_text_ready = False
 
+# PDFs are streamed page by page into the summarizer instead of being extracted up front
+pdf_file = None
+pdf_start, pdf_stop = 0, None
+
 # Tab 1: Text Input
 with tab1:
     input_text = st.text_area("Enter the text you want to summarize:", height=300)
@@ -41,10 +48,30 @@ with tab2:
         # Get file extension
         file_extension = os.path.splitext(uploaded_file.name)[1].lower()
         
+        if file_extension == ".pdf":
+            page_col1, page_col2 = st.columns(2)
+            first_page = page_col1.number_input("First page", min_value=1, value=1)
+            last_page = page_col2.number_input("Last page (0 = end of document)", min_value=0, value=0)
+            pdf_start, pdf_stop = first_page - 1, (last_page or None)
+        
         with st.spinner("Extracting text from document..."):
             # Process based on file type
             if file_extension == ".pdf":
-                input_text = extract_text_from_pdf(uploaded_file)
+                # Only the first pages are read for the preview, in-process and once per file and page
+                # range; the rest is streamed at summary time
+                preview_key = (uploaded_file.name, uploaded_file.size, pdf_start, pdf_stop)
+                if st.session_state.get("pdf_preview_key") != preview_key:
+                    try:
+                        preview = "\n".join(islice(iter_pdf_pages(uploaded_file, pdf_start, pdf_stop, workers=1), 3))
+                        if not preview:
+                            preview = "Error: Could not extract text from PDF."
+                    except Exception as e:
+                        preview = f"Error extracting text: {str(e)}"
+                    st.session_state.pdf_preview_key = preview_key
+                    st.session_state.pdf_preview = preview
+                input_text = st.session_state.pdf_preview
+                if not input_text.startswith("Error"):
+                    pdf_file = uploaded_file
             elif file_extension == ".docx":
                 input_text = extract_text_from_docx(uploaded_file)
             elif file_extension == ".txt":
@@ -65,6 +92,7 @@ with tab3:
         if st.button("Fetch Content"):
             with st.spinner("Fetching content from URL..."):
                 input_text = fetch_text_from_url(url, use_selenium)
+                pdf_file = None
                 
                 if input_text and not input_text.startswith("Error"):
                     is_text_ready = True
@@ -113,28 +141,35 @@ if is_text_ready:
     reading_level = st.slider("Reading Level (1-10):", 1, 10, 5)
     
     # Preview input text
-    with st.expander("Preview Input Text"):
+    with st.expander("Preview Input Text" + (" (first pages)" if pdf_file is not None else "")):
         st.write(input_text[:1000] + ("..." if len(input_text) > 1000 else ""))
         st.text(f"Character count: {len(input_text)}")
     
     # Generate summary button
     if st.button("Generate Summary"):
-        if len(input_text.strip()) < 100:
+        if pdf_file is None and len(input_text.strip()) < 100:
             st.error("Input text is too short (less than 100 characters). Please provide longer content.")
         else:
+            summary_options = dict(
+                summary_type=summary_type,
+                length=length,
+                tone=tone,
+                language=language,
+                focus_areas=focus_areas if focus_areas else None,
+                exclude_areas=exclude_areas if exclude_areas else None,
+                reading_level=reading_level
+            )
+            page_timings = []
             with st.spinner("Generating summary..."):
-                summary = summarize_text(
-                    text=input_text,
-                    summary_type=summary_type,
-                    length=length,
-                    tone=tone,
-                    language=language,
-                    focus_areas=focus_areas if focus_areas else None,
-                    exclude_areas=exclude_areas if exclude_areas else None,
-                    reading_level=reading_level
-                )
+                if pdf_file is not None:
+                    pages = iter_pdf_pages(pdf_file, pdf_start, pdf_stop, timings=page_timings)
+                    summary = summarize_pages(pages, **summary_options)
+                else:
+                    summary = summarize_text(text=input_text, **summary_options)
             
             if summary and not summary.startswith("Error"):
+                if page_timings:
+                    st.caption(format_timings(page_timings))
                 st.header("Summary")
                 st.markdown(summary)
                 
@@ -0,0 +1,211 @@
+"""
+Concurrent URL fetching for batch summarization.
+
+fetch_text_from_url makes one blocking request at a time, so a list of links
+is summarized at the speed of the network round trips added together. Here all
+pages are fetched on one asyncio event loop through a pooled aiohttp session
+(keep-alive connections, a limit per host) and revalidated with ETag /
+Last-Modified headers when they have been fetched before. Extracted texts flow
+through a bounded queue into summarize_batch, so summarization starts as soon
+as the first pages arrive and fetching pauses when the summarizer falls behind.
+"""
+
+import asyncio
+import os
+import sys
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from summarizer import REQUEST_HEADERS, SUMMARY_BATCH_SIZE, html_to_text, summarize_batch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.cache import make_key, result_cache
+
+# **Fetch settings**
+MAX_CONNECTIONS = 64  # Open connections across all hosts
+CONNECTIONS_PER_HOST = 4  # Be polite to every single site
+FETCH_TIMEOUT = 10  # Seconds per request, as in fetch_text_from_url
+QUEUE_SIZE = 32  # Extracted pages waiting for the summarizer before fetching pauses
+KEEPALIVE_TIMEOUT = 30  # Seconds an idle connection is kept for reuse
+
+NO_TEXT_ERROR = "Error: No meaningful text found on the page."
+
+
+def _validator_key(url):
+    """Cache key for the validators (ETag / Last-Modified) and text of a fetched page."""
+    return make_key(url, "http", kind="conditional_get")
+
+
+async def fetch_page(session, url, host_limits, per_host=CONNECTIONS_PER_HOST):
+    """
+    Fetches one page and extracts its paragraph text.
+
+    If the page was fetched before, the request carries If-None-Match /
+    If-Modified-Since and a 304 answer reuses the stored text.
+
+    :param session: The shared aiohttp.ClientSession.
+    :param url: The page to fetch.
+    :param host_limits: Dict of host -> asyncio.Semaphore shared by every fetch of the batch.
+    :param per_host: Concurrent requests allowed per host.
+    :return: {"url", "text", "status", "revalidated", "error"}.
+    """
+    host = urlsplit(url).hostname or ""
+    limit = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+
+    key = _validator_key(url)
+    stored = result_cache.get(key)
+    headers = dict(REQUEST_HEADERS)
+    if stored:
+        if stored.get("etag"):
+            headers["If-None-Match"] = stored["etag"]
+        if stored.get("last_modified"):
+            headers["If-Modified-Since"] = stored["last_modified"]
+
+    try:
+        async with limit:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and stored:
+                    return {"url": url, "text": stored["text"], "status": 304, "revalidated": True, "error": None}
+                response.raise_for_status()
+                html = await response.text()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                status = response.status
+
+        # Parsing is CPU-bound: keep it off the event loop so other downloads continue
+        text = await asyncio.get_running_loop().run_in_executor(None, html_to_text, html)
+        if etag or last_modified:
+            result_cache.set(key, {"etag": etag, "last_modified": last_modified, "text": text})
+        return {"url": url, "text": text, "status": status, "revalidated": False, "error": None}
+
+    except Exception as e:
+        return {"url": url, "text": "", "status": None, "revalidated": False, "error": f"Error fetching content: {str(e)}"}
+
+
+def _make_session(max_connections=MAX_CONNECTIONS, per_host=CONNECTIONS_PER_HOST, timeout=FETCH_TIMEOUT):
+    """Builds a ClientSession whose connector keeps connections alive between requests."""
+    connector = aiohttp.TCPConnector(
+        limit=max_connections,
+        limit_per_host=per_host,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=300
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+
+
+async def iter_fetched_pages(urls, max_connections=MAX_CONNECTIONS, per_host=CONNECTIONS_PER_HOST, queue_size=QUEUE_SIZE):
+    """
+    Fetches many URLs concurrently and yields (index, page) pairs as pages arrive.
+
+    Pages come out in completion order, not input order; `index` is the position of
+    the URL in `urls`. At most `queue_size` fetched pages wait to be consumed.
+
+    :param urls: The URLs to fetch.
+    :param max_connections: Open connections across all hosts.
+    :param per_host: Concurrent requests per host.
+    :param queue_size: Size of the bounded hand-off queue.
+    """
+    urls = list(urls)
+    queue = asyncio.Queue(maxsize=queue_size)
+    pending = iter(enumerate(urls))
+    host_limits = {}
+    done = object()
+
+    async with _make_session(max_connections, per_host) as session:
+
+        async def worker():
+            for index, url in pending:
+                page = await fetch_page(session, url, host_limits, per_host)
+                await queue.put((index, page))  # Blocks while the consumer is behind
+            await queue.put(done)
+
+        worker_count = max(1, min(max_connections, len(urls)))
+        workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+        try:
+            finished = 0
+            while finished < worker_count:
+                item = await queue.get()
+                if item is done:
+                    finished += 1
+                else:
+                    yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def fetch_urls_async(urls, **fetch_options):
+    """Fetches many URLs concurrently and returns their pages in input order."""
+    urls = list(urls)
+    pages = [None] * len(urls)
+    async for index, page in iter_fetched_pages(urls, **fetch_options):
+        pages[index] = page
+    return pages
+
+
+async def summarize_urls_async(urls, summary_type, length, tone, language, focus_areas=None, exclude_areas=None,
+                               reading_level=5, batch_size=SUMMARY_BATCH_SIZE, **fetch_options):
+    """
+    Fetches and summarizes many URLs, summarizing while the remaining pages download.
+
+    Every `batch_size` fetched pages are summarized together in a worker thread
+    with summarize_batch, so the event loop keeps downloading meanwhile.
+
+    :return: One summary (or "Error: ..." message) per URL, in input order.
+    """
+    urls = list(urls)
+    results = [None] * len(urls)
+    loop = asyncio.get_running_loop()
+    batch = []
+
+    async def flush():
+        indices = [index for index, _ in batch]
+        texts = [text for _, text in batch]
+        batch.clear()
+        summaries = await loop.run_in_executor(
+            None,
+            lambda: summarize_batch(
+                texts, summary_type, length, tone, language,
+                focus_areas, exclude_areas, reading_level, batch_size
+            )
+        )
+        for index, summary in zip(indices, summaries):
+            results[index] = summary
+
+    async for index, page in iter_fetched_pages(urls, **fetch_options):
+        if page["error"]:
+            results[index] = page["error"]
+        elif not page["text"]:
+            results[index] = NO_TEXT_ERROR
+        else:
+            batch.append((index, page["text"]))
+            if len(batch) >= batch_size:
+                await flush()
+
+    if batch:
+        await flush()
+    return results
+
+
+def fetch_urls(urls, **fetch_options):
+    """Blocking wrapper around fetch_urls_async for the Streamlit script thread."""
+    return asyncio.run(fetch_urls_async(urls, **fetch_options))
+
+
+def summarize_urls(urls, summary_type, length, tone, language, focus_areas=None, exclude_areas=None,
+                   reading_level=5, batch_size=SUMMARY_BATCH_SIZE, **fetch_options):
+    """
+    Fetches and summarizes a list of URLs.
+
+    :param urls: The pages to summarize.
+    :param summary_type, length, tone, language, focus_areas, exclude_areas, reading_level: Same as for summarize_text.
+    :param batch_size: Pages summarized per forward pass.
+    :param fetch_options: max_connections, per_host or queue_size for iter_fetched_pages.
+    :return: One summary (or "Error: ..." message) per URL, in input order.
+    """
+    return asyncio.run(summarize_urls_async(
+        urls, summary_type, length, tone, language, focus_areas, exclude_areas,
+        reading_level, batch_size, **fetch_options
+    ))
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Pool of warm headless Chrome instances for fetch_text_from_url.
+
+Starting Chrome (and resolving chromedriver) takes seconds, which used to be
+paid for every URL fetched with Selenium. Drivers are now reused across pages,
+health-checked before each use and recycled after a fixed number of pages.
+"""
+
+import atexit
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+
+# **Pool settings (overridable through environment variables)**
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", 2))  # Maximum number of Chrome instances alive at once
+MAX_PAGES_PER_DRIVER = int(os.environ.get("BROWSER_MAX_PAGES_PER_DRIVER", 50))  # Recycle a browser after this many pages to cap memory growth
+PAGE_LOAD_TIMEOUT = 30  # Seconds before driver.get gives up
+WAIT_TIMEOUT = 10  # Seconds the wait strategy may take after the page has loaded
+
+
+class _PooledDriver:
+    """A WebDriver plus the number of pages it has served."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class WebDriverPool:
+    """
+    A bounded pool of warm headless Chrome instances.
+
+    Launching Chrome costs seconds, so drivers are kept alive between pages. Each
+    driver is health-checked before it is handed out and replaced after
+    `max_pages_per_driver` pages or after any error during use.
+
+    :param size: Maximum number of drivers alive at once. Callers block when all are busy.
+    :param max_pages_per_driver: Pages served before a driver is quit and replaced.
+    :param page_load_timeout: Seconds before a page load is aborted.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_pages_per_driver=MAX_PAGES_PER_DRIVER, page_load_timeout=PAGE_LOAD_TIMEOUT):
+        self.max_pages_per_driver = max_pages_per_driver
+        self.page_load_timeout = page_load_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()  # Most recently used driver first: it is the warmest
+        self._service_path = None
+        self._service_lock = threading.Lock()
+        self.created = 0
+        self.recycled = 0
+
+    def _driver_path(self):
+        """Resolves the chromedriver binary once instead of on every launch."""
+        with self._service_lock:
+            if self._service_path is None:
+                self._service_path = ChromeDriverManager().install()
+            return self._service_path
+
+    def _create(self):
+        """Launches a new headless Chrome."""
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")  # Run in headless mode
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+
+        driver = webdriver.Chrome(service=Service(self._driver_path()), options=chrome_options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        self.created += 1
+        return _PooledDriver(driver)
+
+    @staticmethod
+    def _is_healthy(pooled):
+        """Checks that the browser still answers before reusing it."""
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        """Returns a healthy idle driver, or a new one if none is available."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._create()
+            if self._is_healthy(pooled):
+                return pooled
+            self._quit(pooled)
+            self.recycled += 1
+
+    @contextmanager
+    def driver(self):
+        """Context manager that lends a WebDriver from the pool and takes it back afterwards."""
+        self._slots.acquire()
+        pooled = None
+        try:
+            pooled = self._checkout()
+            yield pooled.driver
+        except Exception:
+            # The browser may be in any state after an error: never reuse it
+            if pooled is not None:
+                self._quit(pooled)
+                self.recycled += 1
+                pooled = None
+            raise
+        finally:
+            if pooled is not None:
+                pooled.pages += 1
+                if pooled.pages >= self.max_pages_per_driver:
+                    self._quit(pooled)
+                    self.recycled += 1
+                else:
+                    self._idle.put(pooled)
+            self._slots.release()
+
+    def close(self):
+        """Quits every idle driver."""
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def wait_for_page(driver, wait_for="load", timeout=WAIT_TIMEOUT):
+    """
+    Waits until a page is ready, replacing a fixed sleep.
+
+    :param driver: The WebDriver showing the page.
+    :param wait_for: "load" to wait for document.readyState == "complete", a CSS selector to
+                     wait for that element, a callable taking the driver and returning True
+                     when ready, or None to not wait at all.
+    :param timeout: Maximum number of seconds to wait.
+    """
+    if wait_for is None:
+        return
+    if callable(wait_for):
+        condition = wait_for
+    elif wait_for == "load":
+        condition = lambda d: d.execute_script("return document.readyState") == "complete"
+    else:
+        condition = expected_conditions.presence_of_element_located((By.CSS_SELECTOR, wait_for))
+    WebDriverWait(driver, timeout).until(condition)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Returns the process-wide WebDriver pool, creating it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WebDriverPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def fetch_rendered_html(url, wait_for="load", timeout=WAIT_TIMEOUT, pool=None):
+    """
+    Loads a page in a pooled headless browser and returns the rendered HTML.
+
+    :param url: The page to load.
+    :param wait_for: Wait strategy, see wait_for_page.
+    :param timeout: Maximum number of seconds for the wait strategy.
+    :param pool: WebDriverPool to use. Defaults to the process-wide pool.
+    """
+    pool = pool or get_browser_pool()
+    with pool.driver() as driver:
+        driver.get(url)
+        wait_for_page(driver, wait_for, timeout)
+        return driver.page_source
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Single-pass paragraph extraction from HTML.
+
+html_to_text used to parse pages with BeautifulSoup, build a full tree, walk it
+once per unwanted tag type to remove navigation, asides, footers, headers, scripts and
+styles, then walk it again to collect the <p> elements. This parser does all
+of that in one streaming pass over the tokens of html.parser without building
+a tree: unwanted subtrees are skipped as they are read, and paragraph text is
+collected directly. The output matches
+"\\n".join(p.get_text(strip=True) for p in soup.find_all("p")).
+"""
+
+from html.parser import HTMLParser
+
+# Subtrees left out of the extracted text
+SKIPPED_TAGS = frozenset(["nav", "aside", "footer", "header", "script", "style"])
+
+# Elements that never have content, so they are never pushed on the open-element stack
+VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+    "link", "meta", "param", "source", "track", "wbr", "basefont", "bgsound",
+    "command", "frame", "image", "isindex", "nextid", "spacer"
+])
+
+
+class ParagraphExtractor(HTMLParser):
+    """
+    Collects the text of every <p> element outside the skipped subtrees.
+
+    Open elements are tracked on a stack of tag names. Like BeautifulSoup's
+    html.parser builder, an end tag closes every element opened after the
+    matching start tag, and end tags with no matching start tag are ignored.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs = []  # Per <p>, in document order: list of text pieces
+        self._stack = []  # (tag, index into paragraphs or None, is skipped tag)
+        self._open_paragraphs = []  # Indices of the <p> elements currently open
+        self._skip_depth = 0  # Number of skipped tags currently open
+        self._data = []  # Text read since the last tag, joined into one string like a BeautifulSoup text node
+        self._closed_void = []  # Void elements opened without "/>", whose explicit end tag is ignored
+
+    def handle_starttag(self, tag, attrs):
+        self._end_data()
+        if tag in VOID_TAGS:
+            self._closed_void.append(tag)
+            return
+        paragraph = None
+        if tag == "p" and not self._skip_depth:
+            paragraph = len(self.paragraphs)
+            self.paragraphs.append([])
+            self._open_paragraphs.append(paragraph)
+        skipped = tag in SKIPPED_TAGS
+        if skipped:
+            self._skip_depth += 1
+        self._stack.append((tag, paragraph, skipped))
+
+    def handle_startendtag(self, tag, attrs):
+        # <p/> still counts as an (empty) paragraph
+        self._end_data()
+        if tag == "p" and not self._skip_depth:
+            self.paragraphs.append([])
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void:
+            # The element was closed when it was opened: this end tag does not split the text
+            self._closed_void.remove(tag)
+            return
+        self._end_data()
+        for position in range(len(self._stack) - 1, -1, -1):
+            if self._stack[position][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > position:
+            _, paragraph, skipped = self._stack.pop()
+            if paragraph is not None:
+                self._open_paragraphs.remove(paragraph)
+            if skipped:
+                self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth and self._open_paragraphs:
+            self._data.append(data)
+
+    def handle_comment(self, data):
+        # Comments, doctypes and processing instructions split text nodes but are not part of get_text()
+        self._end_data()
+
+    handle_decl = handle_comment
+    handle_pi = handle_comment
+
+    def unknown_decl(self, data):
+        self._end_data()
+        if data.upper().startswith("CDATA["):
+            # CDATA sections are text nodes of their own
+            self.handle_data(data[len("CDATA["):])
+            self._end_data()
+
+    def _end_data(self):
+        """Closes the current text node and adds it to every open paragraph."""
+        if not self._data:
+            return
+        data = "".join(self._data).strip()
+        self._data = []
+        if data:
+            # Nested paragraphs also count towards every enclosing one, as get_text does
+            for paragraph in self._open_paragraphs:
+                self.paragraphs[paragraph].append(data)
+
+    def close(self):
+        super().close()
+        self._end_data()
+
+    def text(self):
+        """Returns one line per paragraph."""
+        return "\n".join("".join(pieces) for pieces in self.paragraphs)
+
+
+def extract_paragraph_text(html):
+    """
+    Extracts the paragraph text of an HTML page in a single pass.
+
+    :param html: The page source.
+    :return: One line per <p> element outside nav/aside/footer/header/script/style.
+    """
+    parser = ParagraphExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
\ No newline at end of file
@@ -1,16 +1,48 @@
+import os
+import sys
+from itertools import chain, islice
 import requests
-import PyPDF2
-from bs4 import BeautifulSoup
 from docx import Document
-from transformers import pipeline
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 
-# Load a free Hugging Face LLM pipeline for text summarization
-# Use cache_dir to specify where to save the model
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn", device=-1)  # device=-1 forces CPU usage
+from browser_pool import fetch_rendered_html
+from html_extractor import extract_paragraph_text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.batching import run_pipeline
+from shared.cache import make_key, result_cache
+from shared.extraction import format_timings, iter_pdf_pages
+from shared.onnx_backend import get_seq2seq_pipeline
+
+# Free Hugging Face LLM used for text summarization, loaded on first use
+SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+
+def get_summarizer():
+    """Returns the shared summarization pipeline, loading it on first use."""
+    return get_seq2seq_pipeline("summarization", model=SUMMARIZER_MODEL, device=-1)  # device=-1 forces CPU usage
+
+# Long documents are split into overlapping token windows and summarized map-reduce style
+MAX_INPUT_TOKENS = 1024  # BART has a limit around 1024 tokens
+CHUNK_TOKENS = MAX_INPUT_TOKENS - 24  # Leave room for the special tokens added by the tokenizer
+CHUNK_OVERLAP_TOKENS = 128  # Shared context between neighbouring chunks
+SUMMARY_BATCH_SIZE = 4  # Chunks summarized per forward pass
+MAX_REDUCE_ROUNDS = 5  # Safety bound on the recursive reduce step
+
+# Convert length parameter to appropriate max_length value for the model
+MAX_LENGTH_MAP = {
+    "very_short": 100,
+    "short": 150,
+    "medium": 250,
+    "long": 350,
+    "very_long": 450
+}
+
+MIN_LENGTH_MAP = {
+    "very_short": 30,
+    "short": 50,
+    "medium": 100,
+    "long": 150,
+    "very_long": 200
+}
 
 def summarize_text(text, summary_type, length, tone, language, focus_areas=None, exclude_areas=None, reading_level=5):
     """
@@ -27,82 +59,300 @@ def summarize_text(text, summary_type, length, tone, language, focus_areas=None,
         reading_level (int, optional): Target reading level (1-10)
     """
     
-    if not text or not summary_type or not length or not tone or not language:
-        return "Error: All parameters must be provided."
-    
-    # Check if text is too short
-    if len(text.strip()) < 100:
-        return "Error: Text is too short to summarize effectively. Please provide longer content (at least 100 characters)."
+    error = _validate_request(text, summary_type, length, tone, language)
+    if error:
+        return error
     
-    # Model has a maximum input length, truncate if needed
-    max_input_length = 1024  # BART has a limit around 1024 tokens
-    if len(text) > max_input_length * 4:  # Rough character to token ratio
-        text = text[:max_input_length * 4]
-
     # Set defaults for new parameters
     if focus_areas is None:
         focus_areas = ["key points"]
     if exclude_areas is None:
         exclude_areas = []
     
-    # Convert length parameter to appropriate max_length value for the model
-    max_length_map = {
-        "very_short": 100,
-        "short": 150,
-        "medium": 250,
-        "long": 350,
-        "very_long": 450
-    }
-    
-    min_length_map = {
-        "very_short": 30,
-        "short": 50,
-        "medium": 100,
-        "long": 150,
-        "very_long": 200
-    }
-    
     # Use mapped values or defaults
-    max_length = max_length_map.get(length, 250)
-    min_length = min_length_map.get(length, 100)
+    max_length = MAX_LENGTH_MAP.get(length, 250)
+    min_length = MIN_LENGTH_MAP.get(length, 100)
+    
+    # For now, we're not fully utilizing all parameters since the basic BART model
+    # doesn't support them directly, but we're preserving the interface for future enhancements
+    
+    # You could add customized prompt engineering here based on summary_type, tone, etc.
+    return _summarize_single(text, summary_type, max_length, min_length)
+
+def summarize_batch(texts, summary_type, length, tone, language, focus_areas=None, exclude_areas=None, reading_level=5, batch_size=SUMMARY_BATCH_SIZE):
+    """
+    Summarizes many documents at once, sharing forward passes between them.
     
+    Inputs are grouped by tokenized length so every padded batch holds documents of
+    similar size, then run through the pipeline `batch_size` at a time. Documents longer
+    than one model input go through the map-reduce path instead.
+    
+    Args:
+        texts (list): The texts to summarize
+        summary_type, length, tone, language, focus_areas, exclude_areas, reading_level:
+            Same as for summarize_text, applied to every text
+        batch_size (int, optional): Number of documents per forward pass
+    
+    Returns:
+        list: One summary per input, in the original order. Items that fail carry the
+        same "Error: ..." message summarize_text would have returned for them.
+    """
+    results = [None] * len(texts)
+    max_length = MAX_LENGTH_MAP.get(length, 250)
+    min_length = MIN_LENGTH_MAP.get(length, 100)
+
+    pending = []
+    for index, text in enumerate(texts):
+        error = _validate_request(text, summary_type, length, tone, language)
+        if error:
+            results[index] = error
+        else:
+            pending.append(index)
+
+    if not pending:
+        return results
+
     try:
-        # For now, we're not fully utilizing all parameters since the basic BART model
-        # doesn't support them directly, but we're preserving the interface for future enhancements
-        
-        # You could add customized prompt engineering here based on summary_type, tone, etc.
-        # For example:
-        if summary_type == "bullet_points":
-            # Process the summary to convert it to bullets
-            summary = summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)
-            if not summary or len(summary) == 0:
-                return "Error: The summarizer could not process this text. Try with different content."
-                
-            summary_text = summary[0]['summary_text']
-            # Convert to bullet points
-            bullet_points = summary_text.split(". ")
-            return "\n• " + "\n• ".join([point.strip() for point in bullet_points if point.strip()])
+        encoded = get_summarizer().tokenizer([texts[index] for index in pending], add_special_tokens=False)["input_ids"]
+        token_counts = {index: len(ids) for index, ids in zip(pending, encoded)}
+    except Exception as e:
+        for index in pending:
+            results[index] = f"Error: {str(e)}"
+        return results
+
+    # Documents that do not fit into one model input are reduced chunk by chunk
+    short_items = []
+    for index in pending:
+        if token_counts[index] > CHUNK_TOKENS:
+            results[index] = _summarize_single(texts[index], summary_type, max_length, min_length)
         else:
-            summary = summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)
-            if not summary or len(summary) == 0:
-                return "Error: The summarizer could not process this text. Try with different content."
-                
-            return summary[0]['summary_text']
+            short_items.append(index)
+
+    # Sorting by length keeps the padding inside every batch small
+    short_items.sort(key=lambda index: token_counts[index])
+    for start in range(0, len(short_items), batch_size):
+        group = short_items[start:start + batch_size]
+        try:
+            summaries = cached_summaries(
+                [texts[index] for index in group],
+                max_length=max_length,
+                min_length=min_length,
+                batch_size=len(group)
+            )
+        except Exception:
+            # Retry one by one so a single bad document does not fail its whole batch
+            for index in group:
+                results[index] = _summarize_single(texts[index], summary_type, max_length, min_length)
+            continue
+
+        for index, summary_text in zip(group, summaries):
+            if not summary_text:
+                results[index] = "Error: The summarizer could not process this text. Try with different content."
+            else:
+                results[index] = _format_summary(summary_text, summary_type)
+
+    return results
+
+def _validate_request(text, summary_type, length, tone, language):
+    """Returns an error message if the summarization request is invalid, otherwise None."""
+    if not text or not summary_type or not length or not tone or not language:
+        return "Error: All parameters must be provided."
+    
+    # Check if text is too short
+    if len(text.strip()) < 100:
+        return "Error: Text is too short to summarize effectively. Please provide longer content (at least 100 characters)."
+    
+    return None
+
+def _summarize_single(text, summary_type, max_length, min_length):
+    """Summarizes one validated text and maps failures to user-facing error messages."""
+    try:
+        summary_text = map_reduce_summarize(text, max_length=max_length, min_length=min_length)
+        if not summary_text:
+            return "Error: The summarizer could not process this text. Try with different content."
+
+        return _format_summary(summary_text, summary_type)
             
     except IndexError:
         return "Error: The summarizer encountered an issue with this text. This may be due to unusual formatting or content that's difficult to process."
     except Exception as e:
         return f"Error: {str(e)}"
 
-def extract_text_from_pdf(pdf_file):
-    """Extracts raw text from an uploaded PDF file using PyPDF2."""
+def _format_summary(summary_text, summary_type):
+    """Applies the requested presentation to a raw model summary."""
+    if summary_type == "bullet_points":
+        # Convert to bullet points
+        bullet_points = summary_text.split(". ")
+        return "\n• " + "\n• ".join([point.strip() for point in bullet_points if point.strip()])
+    return summary_text
+
+def summarize_pages(pages, summary_type, length, tone, language, focus_areas=None, exclude_areas=None, reading_level=5, batch_size=SUMMARY_BATCH_SIZE):
+    """
+    Summarizes a document given as an iterable of page texts, e.g. iter_pdf_pages(...).
+    
+    Pages are consumed lazily: token windows are cut while pages arrive and summarized
+    batch_size at a time, so only the current batch and the partial summaries are ever
+    held in memory. The partial summaries are then reduced like in summarize_text.
+    
+    Args:
+        pages (iterable): Page texts, in document order
+        summary_type, length, tone, language, focus_areas, exclude_areas, reading_level:
+            Same as for summarize_text
+        batch_size (int, optional): Number of chunks per forward pass
+    """
+    if not summary_type or not length or not tone or not language:
+        return "Error: All parameters must be provided."
+    
+    max_length = MAX_LENGTH_MAP.get(length, 250)
+    min_length = MIN_LENGTH_MAP.get(length, 100)
+    
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            extracted = page.extract_text()
-            if extracted:
-                text += extracted + "\n"
+        chunks = iter_token_chunks(pages)
+        head = list(islice(chunks, 2))
+        if len(head) < 2:
+            # The whole document fits into a single model input
+            text = head[0] if head else ""
+            if not text.strip():
+                # Empty or image-only PDFs yield no page text at all
+                return "Error: No extractable text found in the document."
+            return _validate_request(text, summary_type, length, tone, language) or _summarize_single(text, summary_type, max_length, min_length)
+        
+        partial_max_length, partial_min_length = _partial_lengths(max_length, min_length)
+        partials = summarize_chunks(chain(head, chunks), partial_max_length, partial_min_length, batch_size)
+    except Exception as e:
+        return f"Error: {str(e)}"
+    
+    return _summarize_single(" ".join(partials), summary_type, max_length, min_length)
+
+def iter_token_chunks(pieces, chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    """
+    Cuts a stream of text pieces (e.g. pages) into overlapping windows measured with the BART tokenizer.
+
+    Every window holds at most `chunk_tokens` tokens and shares `overlap` tokens with
+    the previous one. The last window is aligned to the end of the text so that no
+    chunk is a tiny leftover that the summarizer would pad out with filler. Only about
+    one window of tokens is buffered at a time, so the pieces are never joined.
+    """
+    tokenizer = get_summarizer().tokenizer
+    separator = tokenizer.encode("\n", add_special_tokens=False)
+    step = max(chunk_tokens - overlap, 1)
+
+    buffer, start, emitted, raw_pieces = [], 0, False, []
+    for piece in pieces:
+        if buffer:
+            buffer.extend(separator)
+        buffer.extend(tokenizer.encode(piece, add_special_tokens=False))
+        if not emitted:
+            raw_pieces.append(piece)
+
+        while len(buffer) - start > chunk_tokens:
+            yield tokenizer.decode(buffer[start:start + chunk_tokens], skip_special_tokens=True).strip()
+            emitted, raw_pieces = True, []
+            start += step
+
+        # Drop tokens no window will cover again, keeping one full window for the end-aligned chunk
+        drop = max(0, min(start, len(buffer) - chunk_tokens))
+        if drop:
+            del buffer[:drop]
+            start -= drop
+
+    if not emitted:
+        # Everything fits into one window: hand back the original text untouched
+        if raw_pieces:
+            yield "\n".join(raw_pieces)
+    else:
+        yield tokenizer.decode(buffer[-chunk_tokens:], skip_special_tokens=True).strip()
+
+def chunk_text(text, chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    """Splits text into overlapping token windows, see iter_token_chunks."""
+    return list(iter_token_chunks([text], chunk_tokens, overlap))
+
+def map_reduce_summarize(text, max_length, min_length, batch_size=SUMMARY_BATCH_SIZE):
+    """
+    Summarizes text of any length with a hierarchical map-reduce pass.
+
+    Map: the text is split into overlapping token windows that are summarized in
+    batches through the pipeline. Reduce: the partial summaries are joined and the
+    process repeats until the joined text fits into a single model input, which is
+    then summarized to the requested length.
+    """
+    # Repeat requests for the same document skip chunking and the model entirely
+    document_key = make_key(text, SUMMARIZER_MODEL, mode="map_reduce", max_length=max_length, min_length=min_length)
+    cached = result_cache.get(document_key)
+    if cached is not None:
+        return cached
+
+    partial_max_length, partial_min_length = _partial_lengths(max_length, min_length)
+
+    for _ in range(MAX_REDUCE_ROUNDS):
+        chunks = chunk_text(text)
+        if len(chunks) == 1:
+            break
+
+        partials = summarize_chunks(chunks, partial_max_length, partial_min_length, batch_size)
+        reduced = " ".join(partials)
+
+        # Stop reducing once a round no longer shrinks the text; the final call truncates instead
+        made_progress = len(reduced) < len(text)
+        text = reduced
+        if not made_progress:
+            break
+
+    summary_text = cached_summaries([text], max_length=max_length, min_length=min_length)[0]
+    if summary_text:
+        result_cache.set(document_key, summary_text)
+    return summary_text
+
+def summarize_chunks(chunks, max_length, min_length, batch_size=SUMMARY_BATCH_SIZE):
+    """Summarizes an iterable of chunks batch_size at a time and returns the partial summaries."""
+    partials, batch = [], []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            partials.extend(cached_summaries(batch, max_length=max_length, min_length=min_length, batch_size=batch_size))
+            batch = []
+    if batch:
+        partials.extend(cached_summaries(batch, max_length=max_length, min_length=min_length, batch_size=batch_size))
+    return [partial.strip() for partial in partials]
+
+def _partial_lengths(max_length, min_length):
+    """Returns the (max_length, min_length) used for partial summaries of single chunks."""
+    # Partial summaries only need to keep the gist of each chunk
+    partial_max_length = min(max_length, 200)
+    return partial_max_length, min(min_length, partial_max_length // 2)
+
+def cached_summaries(texts, max_length, min_length, batch_size=SUMMARY_BATCH_SIZE):
+    """
+    Runs texts through the summarizer, skipping every text whose summary is already cached.
+
+    Generation is deterministic (do_sample=False), so results are cached by a hash of the
+    normalized input, the model id and the length settings. Only the misses are batched
+    through the pipeline.
+    """
+    generation_kwargs = {"max_length": max_length, "min_length": min_length, "do_sample": False, "truncation": True}
+    keys = [make_key(text, SUMMARIZER_MODEL, **generation_kwargs) for text in texts]
+    results = [result_cache.get(key) for key in keys]
+
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        outputs = run_pipeline(get_summarizer, [texts[index] for index in missing], batch_size=batch_size, **generation_kwargs)
+        for index, output in zip(missing, outputs):
+            summary_text = output["summary_text"] if output else ""
+            results[index] = summary_text
+            if summary_text:
+                result_cache.set(keys[index], summary_text)
+
+    return results
+
+def extract_text_from_pdf(pdf_file, start=0, stop=None):
+    """
+    Extracts raw text from an uploaded PDF file using PyPDF2.
+    
+    Use iter_pdf_pages with summarize_pages instead to summarize a large PDF without
+    holding its full text in memory.
+    """
+    try:
+        text = "\n".join(iter_pdf_pages(pdf_file, start, stop))
         return text.strip() if text else "Error: Could not extract text from PDF."
     except Exception as e:
         return f"Error extracting text: {str(e)}"
@@ -116,53 +366,42 @@ def extract_text_from_docx(docx_file):
     except Exception as e:
         return f"Error extracting text: {str(e)}"
 
-def fetch_text_from_url(url, use_selenium=False):
+# Browser-like headers for plain HTTP fetches
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+def html_to_text(html):
+    """
+    Extracts the paragraph text of an HTML page, leaving out navigation, ads and footers.
+    
+    :param html: The page source.
+    :return: One line per <p> element, or an empty string if the page has none.
+    """
+    # Single streaming pass: unwanted subtrees are skipped while <p> text is collected
+    return extract_paragraph_text(html)
+
+def fetch_text_from_url(url, use_selenium=False, wait_for="load"):
     """
     Fetches and extracts clean text content from a web URL.
     Supports dynamic JavaScript-rendered content using Selenium if needed.
     
     :param url: The web page URL to extract text from.
     :param use_selenium: Set to True if JavaScript-rendered content needs to be extracted.
+    :param wait_for: Selenium wait strategy: "load", a CSS selector or a callable (see browser_pool.wait_for_page).
     :return: Extracted clean text or error message.
     """
     try:
         if use_selenium:
-            # Set up Selenium WebDriver
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")  # Run in headless mode
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-
-            # Load the page and get rendered HTML
-            driver.get(url)
-            driver.implicitly_wait(5)  # Wait for JavaScript to load
-            html = driver.page_source
-            driver.quit()
+            # Render the page in a warm browser from the shared pool
+            html = fetch_rendered_html(url, wait_for=wait_for)
         else:
             # Simple request for static content
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.get(url, headers=headers, timeout=10)
+            response = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
             response.raise_for_status()
             html = response.text
 
-        # Parse HTML with BeautifulSoup
-        soup = BeautifulSoup(html, "html.parser")
-
-        # Remove unwanted elements like navigation, ads, footers
-        for tag in ["nav", "aside", "footer", "header", "script", "style"]:
-            for element in soup.find_all(tag):
-                element.extract()
-
-        # Extract visible text
-        paragraphs = soup.find_all("p")
-        text = "\n".join([para.get_text(strip=True) for para in paragraphs])
-
+        text = html_to_text(html)
         return text if text else "Error: No meaningful text found on the page."
 
     except Exception as e:
@@ -1,20 +1,14 @@
 import streamlit as st
-import torch
-import datetime
 import os
 import sys
 
 # Import functions from the therapist.py script
 # Assuming the pasted code is saved as therapist.py in the same directory
+from session_store import session_store
 from therapist import (
     MODEL_NAME, 
-    tokenizer, 
-    model,
-    sentiment_analyzer,
-    toxicity_classifier,
-    analyze_sentiment,
-    detect_toxicity,
-    generate_emotional_prompt
+    session_manager,
+    therapist_turn
 )
 
 # Page configuration
@@ -26,14 +20,18 @@ st.set_page_config(
 )
 
 # Initialize session state variables
-if 'conversation_memory' not in st.session_state:
-    st.session_state.conversation_memory = []
-if 'session_log' not in st.session_state:
-    st.session_state.session_log = []
+# The conversation itself lives in the process-wide session manager, shared by every browser session
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = None
 if 'user_details' not in st.session_state:
     st.session_state.user_details = {}
 if 'onboarding_complete' not in st.session_state:
     st.session_state.onboarding_complete = False
+if st.session_state.onboarding_complete and not session_manager.exists(st.session_state.session_id):
+    # Ended or expired on the server: start over
+    if session_manager.dropped(st.session_state.session_id):
+        st.info("Your previous session was not saved and ended after a period of inactivity. Nothing of it was stored.")
+    st.session_state.onboarding_complete = False
 
 # Custom CSS
 st.markdown("""
@@ -91,79 +89,36 @@ def start_session():
         "location": location or "Somewhere",
         "reason": reason or "To talk"
     }
+    st.session_state.session_id = session_manager.create(st.session_state.user_details)
     st.session_state.onboarding_complete = True
     # Add welcome message to conversation
     welcome_msg = f"👋 Hello {st.session_state.user_details['name']} from {st.session_state.user_details['location']}! I'm here to support you. Let's talk about {st.session_state.user_details['reason']}."
-    st.session_state.conversation_memory.append(f"Therapist: {welcome_msg}")
-    st.session_state.session_log.append(f"Therapist: {welcome_msg}")
+    with session_manager.session(st.session_state.session_id) as session:
+        session.memory.append(f"Therapist: {welcome_msg}")
+        session.log.append(f"Therapist: {welcome_msg}")
 
 # Function to reset session
 def reset_session():
-    st.session_state.conversation_memory = []
-    st.session_state.session_log = []
+    if st.session_state.session_id:
+        session_manager.end(st.session_state.session_id)
+    st.session_state.session_id = None
     st.session_state.onboarding_complete = False
 
 # Function to handle user message
 def process_user_message():
-    # Check for toxicity
-    is_toxic, toxicity_score = detect_toxicity(user_input)
+    # Screen the message, generate the reply and log both (only the new turn is encoded)
+    with session_manager.session(st.session_state.session_id) as session:
+        response = therapist_turn(session, user_input)
     
-    if is_toxic:
+    if response is None:
         st.warning("⚠️ I detected potentially harmful language. Let's focus on positive healing. 💙")
-        st.session_state.session_log.append(f"You: [REDACTED TOXIC CONTENT]")
-    else:
-        # Add user message to conversation
-        st.session_state.conversation_memory.append(f"You: {user_input}")
-        st.session_state.session_log.append(f"You: {user_input}")
-        
-        # Generate emotional prompt based on sentiment
-        emotional_prompt = generate_emotional_prompt(user_input)
-        
-        # Prepare input for model
-        input_text = " ".join(st.session_state.conversation_memory[-6:]) + f" {emotional_prompt} {user_input}"
-        input_ids = tokenizer(input_text, return_tensors="pt")
-        
-        # Generate response
-        with torch.no_grad():
-            response_ids = model.generate(
-                input_ids["input_ids"],
-                max_length=150,
-                temperature=0.7,
-                top_p=0.92,
-                do_sample=True
-            )
-        
-        # Decode response
-        response = tokenizer.decode(response_ids[0], skip_special_tokens=True)
-        
-        # Check response for toxicity
-        is_toxic, _ = detect_toxicity(response)
-        if is_toxic:
-            response = "I'm here to help in a supportive and respectful way. Let's focus on healing. 💙"
-        
-        # Make response more empathetic
-        response = response.replace("I am", "I'm").replace("do not", "don't").replace("you are", "you're")
-        
-        # Add therapist response to conversation
-        st.session_state.conversation_memory.append(f"Therapist: {response}")
-        st.session_state.session_log.append(f"Therapist: {response}")
-        
-        # Keep only last 6 messages
-        st.session_state.conversation_memory = st.session_state.conversation_memory[-6:]
 
 # Function to save conversation
 def save_conversation():
-    # Create directory if it doesn't exist
-    if not os.path.exists("therapy_sessions"):
-        os.makedirs("therapy_sessions")
+    # Write the session to the store (until now it only lived in memory)
+    session_id = session_manager.save(st.session_state.session_id)
     
-    # Save conversation to file
-    filename = f"therapy_sessions/therapy_session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    with open(filename, "w", encoding="utf-8") as file:
-        for line in st.session_state.session_log:
-            file.write(line + "\n")
-    
-    st.success(f"💾 Your session has been saved as `{filename}`")
+    st.success(f"💾 Your session has been saved as `{session_id}` in `{session_store.path}`")
 
 # User onboarding form
 if not st.session_state.onboarding_complete:
@@ -189,9 +144,12 @@ if st.session_state.onboarding_complete:
     # Display conversation history
     st.subheader("Your Session")
     
+    with session_manager.session(st.session_state.session_id) as session:
+        messages = list(session.memory)
+    
     chat_container = st.container()
     with chat_container:
-        for message in st.session_state.conversation_memory:
+        for message in messages:
             parts = message.split(": ", 1)
             if len(parts) == 2:
                 speaker, content = parts
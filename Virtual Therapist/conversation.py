@@ -0,0 +1,122 @@
+"""
+Conversation window with cached encoder outputs for the therapist model.
+
+Every turn joins the last six messages into one string, tokenizes it and runs
+the whole context through the t5-small encoder again, so each turn re-encodes
+five messages that were already encoded before. With ENCODER_CACHE=1, every
+message is encoded once instead, when it first takes part in a generation. Its
+encoder output is kept until the message leaves the window, and only the new
+turn is encoded. The decoder then attends to the concatenated cached outputs.
+
+The cache is opt-in because it is an approximation and changes the replies.
+Messages are encoded independently, so a message no longer attends to its
+neighbours inside the encoder as it does in the joined string (the decoder
+still sees the whole window). In exchange, per-turn encoder cost stays flat as
+the conversation grows. Without the flag, generate() encodes the joined window
+exactly as before.
+"""
+
+import os
+import sys
+from collections import deque
+
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.batching import DYNAMIC_BATCHING, run_generate
+
+CONTEXT_MESSAGES = 6  # Messages kept as context for the model
+ENCODER_CACHING = os.environ.get("ENCODER_CACHE", "").lower() in ("1", "true", "yes")  # Opt-in, see above
+
+
+class ConversationState:
+    """
+    The last `window` messages of a conversation, with their encoder outputs.
+
+    Iterating over the state yields the message texts, oldest first.
+
+    :param get_model: Accessor returning the shared (tokenizer, model) pair.
+    :param window: Number of messages kept; older messages and their encoder outputs are evicted.
+    """
+
+    __slots__ = ("get_model", "window", "_messages", "_model_id", "encoded_tokens")
+
+    def __init__(self, get_model, window=CONTEXT_MESSAGES):
+        self.get_model = get_model
+        self.window = window
+        self._messages = deque(maxlen=window)  # [text, encoder output or None]
+        self._model_id = None  # The model the cached outputs were computed with
+        self.encoded_tokens = 0  # Tokens run through the encoder, for monitoring
+
+    def append(self, message):
+        """Adds a message; the oldest one leaves the window when it is full."""
+        self._messages.append([message, None])
+
+    def clear(self):
+        self._messages.clear()
+
+    def drop_encoder_outputs(self):
+        """Frees the cached encoder outputs; they are recomputed by the next generation."""
+        for entry in self._messages:
+            entry[1] = None
+
+    def memory_bytes(self):
+        """Approximate memory held by the messages and their cached encoder outputs, in bytes."""
+        total = sys.getsizeof(self._messages)
+        for text, states in list(self._messages):
+            total += sys.getsizeof(text)
+            if states is not None:
+                total += states.element_size() * states.nelement()
+        return total
+
+    def __iter__(self):
+        return (text for text, _ in list(self._messages))
+
+    def __len__(self):
+        return len(self._messages)
+
+    def input_text(self, suffix):
+        """The model input as a single string, as it was built before caching."""
+        return " ".join(self) + f" {suffix}"
+
+    def _encode(self, tokenizer, model, text, add_special_tokens):
+        input_ids = tokenizer(text, return_tensors="pt", add_special_tokens=add_special_tokens)["input_ids"]
+        self.encoded_tokens += input_ids.shape[1]
+        with torch.no_grad():
+            return model.get_encoder()(input_ids=input_ids).last_hidden_state
+
+    def generate(self, suffix, **generate_kwargs):
+        """
+        Generates a reply to the window followed by `suffix`, from cached encoder outputs with ENCODER_CACHE=1.
+
+        :param suffix: Text appended after the messages for this turn only (emotional prompt and user message).
+        :param generate_kwargs: Arguments for model.generate.
+        :return: The decoded reply.
+        """
+        tokenizer, model = self.get_model()
+        if not ENCODER_CACHING or DYNAMIC_BATCHING or not hasattr(model, "get_encoder"):
+            # The joined window is encoded as a whole; batched requests and ONNX Runtime models always are
+            return run_generate(self.get_model, self.input_text(suffix), **generate_kwargs)
+
+        if self._model_id != id(model):
+            # The model was reloaded: outputs of the previous instance are not reused
+            self.drop_encoder_outputs()
+            self._model_id = id(model)
+
+        states = []
+        for entry in self._messages:
+            if entry[1] is None:
+                entry[1] = self._encode(tokenizer, model, entry[0], add_special_tokens=False)
+            states.append(entry[1])
+        # The turn's suffix closes the input, so it carries the end-of-sequence token
+        states.append(self._encode(tokenizer, model, suffix, add_special_tokens=True))
+
+        hidden = torch.cat(states, dim=1)
+        with torch.no_grad():
+            output_ids = model.generate(
+                encoder_outputs=BaseModelOutput(last_hidden_state=hidden),
+                attention_mask=torch.ones(hidden.shape[:2], dtype=torch.long),
+                **generate_kwargs
+            )
+        return tokenizer.decode(output_ids[0], skip_special_tokens=True)
\ No newline at end of file
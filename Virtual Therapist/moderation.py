@@ -0,0 +1,114 @@
+"""
+Fused moderation stage for the therapist: sentiment and toxicity classification.
+
+A turn used to make three separate classifier calls: toxicity of the user's
+message, sentiment of the same message inside generate_emotional_prompt, and
+toxicity of the reply. Each call tokenized and ran one text on its own. Here
+texts are classified in batches: one tokenization and one forward pass per
+classifier for all texts of a call. Results are cached by a hash of the
+normalized text, so classifying a message once per turn covers every later
+lookup. This includes the repeated calls of a Streamlit rerun.
+
+The two classifiers use different tokenizers (DistilBERT WordPiece and RoBERTa
+BPE), so every text is still tokenized once per classifier.
+
+Before the toxicity model, every text goes through the lexical prefilter
+(prefilter.py). Clearly safe texts are decided there, and every other text,
+abusive-looking ones included, escalates to RoBERTa.
+"""
+
+import os
+import sys
+
+from prefilter import lexical_prefilter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.cache import ResultCache, make_key
+from shared.registry import get_pipeline
+
+# **Sentiment Analysis & Toxicity Filter**
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"  # Default model of the sentiment-analysis pipeline
+TOXICITY_MODEL = "facebook/roberta-hate-speech-dynabench-r4-target"
+TOXIC_LABEL = "hate_speech"
+
+# Memory-only: classifications are cheap to redo, and user messages should not be written to disk
+MODERATION_CACHE_ITEMS = 4096
+moderation_cache = ResultCache(path=None, memory_items=MODERATION_CACHE_ITEMS)
+
+
+def get_sentiment_analyzer():
+    """Returns the shared sentiment analysis pipeline."""
+    return get_pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+
+
+def get_toxicity_classifier():
+    """Returns the shared toxicity classification pipeline."""
+    return get_pipeline("text-classification", model=TOXICITY_MODEL)
+
+
+def _classify(get_classifier, model_name, texts):
+    """Returns one {"label", "score"} per text, running only the cache misses, as one batch."""
+    keys = [make_key(text, model_name, task="classification") for text in texts]
+    results = [moderation_cache.get(key) for key in keys]
+
+    # Classify every distinct missing text once, even if it appears several times
+    missing = {}
+    for index, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[index], index)
+    if missing:
+        outputs = get_classifier()(
+            [texts[index] for index in missing.values()], batch_size=len(missing), truncation=True
+        )
+        fresh = {}
+        for key, output in zip(missing, outputs):
+            fresh[key] = {"label": output["label"], "score": output["score"]}
+            moderation_cache.set(key, fresh[key])
+        results = [result if result is not None else fresh[key] for key, result in zip(keys, results)]
+    return results
+
+
+def classify_texts(texts, sentiment=True, toxicity=True):
+    """
+    Classifies a batch of texts with the sentiment and/or toxicity models.
+
+    :param texts: The texts to classify.
+    :param sentiment: Run the sentiment classifier.
+    :param toxicity: Run the toxicity classifier.
+    :return: One dict per text with "sentiment", "sentiment_score", "toxic", "toxicity_score" and
+             "toxicity_source" ("lexicon" or "model"). The keys of a skipped classifier are missing.
+    """
+    texts = list(texts)
+    results = [{} for _ in texts]
+    if not texts:
+        return results
+
+    if sentiment:
+        for result, output in zip(results, _classify(get_sentiment_analyzer, SENTIMENT_MODEL, texts)):
+            result["sentiment"] = output["label"]
+            result["sentiment_score"] = output["score"]
+    if toxicity:
+        escalated = []
+        for index, text in enumerate(texts):
+            decision, score = lexical_prefilter.screen(text)
+            if decision is None:
+                escalated.append(index)
+            else:
+                results[index].update(toxic=False, toxicity_score=score, toxicity_source="lexicon")
+        if escalated:
+            outputs = _classify(get_toxicity_classifier, TOXICITY_MODEL, [texts[index] for index in escalated])
+            for index, output in zip(escalated, outputs):
+                results[index].update(
+                    toxic=output["label"] == TOXIC_LABEL, toxicity_score=output["score"], toxicity_source="model"
+                )
+    return results
+
+
+def moderation_stats():
+    """Returns the prefilter counters (escalation rate included) and the classification cache counters."""
+    return {"prefilter": lexical_prefilter.stats(), "cache": moderation_cache.stats()}
+
+
+def moderate(text, sentiment=True, toxicity=True):
+    """Classifies a single text; see classify_texts."""
+    return classify_texts([text], sentiment=sentiment, toxicity=toxicity)[0]
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Lexical prefilter in front of the RoBERTa hate-speech classifier.
+
+Most therapist traffic is clearly benign ("ok thanks", "yes", "hello") and can
+be decided from the words alone in microseconds, so only the remaining texts
+need a transformer forward pass. The prefilter looks up the word unigrams and
+bigrams of a text in two lexicons held in hash sets:
+
+- safe: short conversational words. A text of at most SAFE_MAX_TOKENS words,
+  with at least SAFE_RATIO of them in the safe lexicon and no flagged phrase,
+  is safe.
+- flagged: abusive phrases. A hit only keeps the text from being decided safe.
+
+The prefilter never decides that a text is toxic: everything that is not
+clearly safe escalates to the model. Profanity and self-insults ("I feel like
+a piece of shit") are common from users in distress, and the hate-speech
+classifier, not a word list, decides whether they are redacted. Thresholds
+come from environment variables, and extra flagged phrases can be loaded from
+a file (MODERATION_LEXICON_PATH, one phrase per line).
+"""
+
+import os
+import re
+import threading
+
+# **Prefilter thresholds (overridable through environment variables)**
+SAFE_MAX_TOKENS = int(os.environ.get("MODERATION_SAFE_MAX_TOKENS", 8))  # Longer texts are never decided as safe
+SAFE_RATIO = float(os.environ.get("MODERATION_SAFE_RATIO", 1.0))  # Share of words that must be in the safe lexicon
+LEXICON_PATH = os.environ.get("MODERATION_LEXICON_PATH", "")
+
+# Abusive phrases that always send a text to the model, even when it is short and otherwise
+# conversational ("ok fuck you"). Deployments extend it through LEXICON_PATH.
+FLAGGED_LEXICON = frozenset({
+    "kill yourself", "go die", "i will kill you", "i hate you", "shut up", "you are worthless",
+    "you're worthless", "piece of shit", "fuck you", "fuck off", "idiot", "moron", "stupid",
+    "bitch", "bastard", "asshole",
+})
+
+SAFE_LEXICON = frozenset("""
+    ok okay k thanks thank thx ty you yes yeah yep no nope nah sure fine good great nice
+    cool alright right hi hello hey bye goodbye morning evening night afternoon please
+    sorry welcome i'm im am i it's its that is was so much a lot very well really
+    understand see agree got it maybe not sure how are doing today bit better
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def _normalize(text):
+    return text.lower().replace("\u2019", "'")
+
+
+def _load_lexicon(path):
+    """Reads extra flagged phrases, one per line (anything after a tab is ignored)."""
+    lexicon = set()
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            lexicon.add(line.partition("\t")[0].strip().lower())
+    return lexicon
+
+
+class LexicalPrefilter:
+    """
+    Decides clearly safe texts from their words; every other text goes to the model.
+
+    :param flagged_lexicon: Set of phrases (one or two words, or a longer phrase) that prevent a safe decision.
+    :param safe_lexicon: Set of words considered benign.
+    :param safe_max_tokens: Maximum number of words of a text decided as safe.
+    :param safe_ratio: Share of words that must be in the safe lexicon.
+    """
+
+    SAFE = "safe"
+
+    def __init__(self, flagged_lexicon=None, safe_lexicon=SAFE_LEXICON, safe_max_tokens=SAFE_MAX_TOKENS,
+                 safe_ratio=SAFE_RATIO):
+        flagged_lexicon = FLAGGED_LEXICON if flagged_lexicon is None else flagged_lexicon
+        # Unigrams and bigrams are looked up in a set; longer phrases go through one compiled regex
+        self._ngrams = frozenset(phrase for phrase in flagged_lexicon if len(phrase.split()) <= 2)
+        long_phrases = [phrase for phrase in flagged_lexicon if len(phrase.split()) > 2]
+        self._long_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(phrase) for phrase in sorted(long_phrases, key=len, reverse=True)) + r")\b"
+        ) if long_phrases else None
+        self.safe_lexicon = frozenset(safe_lexicon)
+        self.safe_max_tokens = safe_max_tokens
+        self.safe_ratio = safe_ratio
+        self._lock = threading.Lock()
+        self.decided_safe = 0
+        self.escalated = 0
+
+    def is_flagged(self, text, tokens=None):
+        """True if the text contains a flagged phrase."""
+        lowered = _normalize(text)
+        tokens = _TOKEN_PATTERN.findall(lowered) if tokens is None else tokens
+        for index, token in enumerate(tokens):
+            if token in self._ngrams or (index and f"{tokens[index - 1]} {token}" in self._ngrams):
+                return True
+        return self._long_pattern is not None and self._long_pattern.search(lowered) is not None
+
+    def screen(self, text):
+        """
+        Screens one text.
+
+        :return: ("safe", 1.0), or (None, 0.0) when the text has to go to the model.
+        """
+        tokens = _TOKEN_PATTERN.findall(_normalize(text))
+        safe = (
+            0 < len(tokens) <= self.safe_max_tokens
+            and sum(token in self.safe_lexicon for token in tokens) >= self.safe_ratio * len(tokens)
+            and not self.is_flagged(text, tokens)
+        )
+        with self._lock:
+            if safe:
+                self.decided_safe += 1
+            else:
+                self.escalated += 1
+        return (self.SAFE, 1.0) if safe else (None, 0.0)
+
+    def stats(self):
+        """Returns the decision counters and the share of texts escalated to the model."""
+        with self._lock:
+            screened = self.decided_safe + self.escalated
+            return {
+                "decided_safe": self.decided_safe,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / screened if screened else 0.0
+            }
+
+
+def _build_default():
+    lexicon = set(FLAGGED_LEXICON)
+    if LEXICON_PATH:
+        lexicon.update(_load_lexicon(LEXICON_PATH))
+    return LexicalPrefilter(flagged_lexicon=lexicon)
+
+
+# **Process-wide prefilter used by the moderation stage**
+lexical_prefilter = _build_default()
\ No newline at end of file
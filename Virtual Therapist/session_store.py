@@ -0,0 +1,366 @@
+"""
+Append-only session store for therapist conversations.
+
+save_conversation used to write one timestamped .txt file per session into
+therapy_sessions/, and the session log was an unbounded list. Messages now go
+to one SQLite database in WAL mode, indexed by session, user and time. Writes
+are queued and flushed in batches by a background thread, so a chat turn never
+waits on the disk. The live transcript of a session is a bounded ring buffer
+(SessionLog). Older messages remain available from the store.
+
+Nothing reaches the disk before the user agrees to save. A SessionLog keeps
+every line of an unsaved session in memory, and save() writes the session with
+all its lines in one transaction. The lines of a saved session are then
+written as they arrive. A session that ends unsaved is simply dropped.
+
+The session manager (sessions.py) also parks the state of idle sessions here,
+in the parked_sessions table, until they are resumed. Parked states not
+resumed within PARKED_RETENTION_SECONDS are purged.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+# **Store settings (overridable through environment variables)**
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", os.path.join("therapy_sessions", "sessions.sqlite"))
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("SESSION_FLUSH_INTERVAL_SECONDS", 2.0))
+FLUSH_BATCH_SIZE = 256  # Pending writes that trigger an early flush
+LIVE_BUFFER_MESSAGES = 500  # Messages of the live session kept in memory
+PARKED_RETENTION_SECONDS = 24 * 3600  # Parked sessions not resumed for this long are purged
+PURGE_INTERVAL_SECONDS = 3600  # How often the flusher purges them
+
+
+def split_speaker(line):
+    """Splits a log line such as "You: hello" into ("You", "hello")."""
+    speaker, separator, text = line.partition(": ")
+    return (speaker, text) if separator else ("", line)
+
+
+class SessionStore:
+    """
+    SQLite-backed store of sessions and their messages, with batched background writes.
+
+    :param path: SQLite file.
+    :param flush_interval: Seconds between background flushes.
+    :param batch_size: Number of pending writes that wakes the flusher early.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, flush_interval=FLUSH_INTERVAL_SECONDS, batch_size=FLUSH_BATCH_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = []  # (sql, parameters) in arrival order
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Held from taking a batch until it is written, so batches stay in order
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._db = None
+        self._flusher = None
+
+    def _connection(self):
+        """Opens the database and starts the flusher on first use."""
+        with self._db_lock:
+            if self._db is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.executescript(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "session_id TEXT PRIMARY KEY, user_name TEXT, details TEXT, "
+                    "started REAL NOT NULL, ended REAL, saved INTEGER NOT NULL DEFAULT 0);"
+                    "CREATE TABLE IF NOT EXISTS messages ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, user_name TEXT, "
+                    "created REAL NOT NULL, speaker TEXT, text TEXT NOT NULL);"
+                    "CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);"
+                    "CREATE INDEX IF NOT EXISTS messages_user_time ON messages (user_name, created);"
+                    "CREATE INDEX IF NOT EXISTS messages_time ON messages (created);"
+                    "CREATE INDEX IF NOT EXISTS sessions_user_time ON sessions (user_name, started);"
+                    "CREATE TABLE IF NOT EXISTS parked_sessions ("
+                    "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, parked REAL NOT NULL);"
+                )
+                self._db.commit()
+                self._purge_parked(time.time() - PARKED_RETENTION_SECONDS)
+                self._flusher = threading.Thread(target=self._run_flusher, name="session-store-flush", daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+            return self._db
+
+    def _queue(self, sql, parameters):
+        self._queue_many([(sql, parameters)])
+
+    def _queue_many(self, statements):
+        """Queues (sql, parameters) statements that are always written in the same transaction."""
+        self._connection()
+        with self._pending_lock:
+            self._pending.extend(statements)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _run_flusher(self):
+        next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_purge:
+                    next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+                    self.purge_parked()
+            except Exception as e:
+                print(f"❌ Error writing therapy sessions: {str(e)}")
+
+    def _write_pending(self):
+        """Writes every pending change in one transaction. Caller holds the flush lock."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        db = self._connection()
+        try:
+            with self._db_lock:
+                with db:
+                    for sql, parameters in pending:
+                        db.execute(sql, parameters)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                # The transaction was rolled back: retry the batch with the next flush
+                with self._pending_lock:
+                    self._pending[:0] = pending
+            raise
+
+    def flush(self):
+        """Writes every pending change in one transaction."""
+        with self._flush_lock:
+            self._write_pending()
+
+    def purge_parked(self):
+        """Deletes parked states not resumed for PARKED_RETENTION_SECONDS."""
+        with self._flush_lock:
+            self._write_pending()
+            with self._db_lock:
+                self._purge_parked(time.time() - PARKED_RETENTION_SECONDS)
+
+    def close(self):
+        """Flushes pending writes and stops the background thread."""
+        self._stopped = True
+        self._wake.set()
+        if self._db is not None:
+            self.flush()
+
+    # **Writes (queued)**
+
+    def update_user(self, session_id, user_details):
+        self._queue(
+            "UPDATE sessions SET user_name = ?, details = ? WHERE session_id = ?",
+            (user_details.get("name"), json.dumps(user_details), session_id)
+        )
+        self._queue("UPDATE messages SET user_name = ? WHERE session_id = ?", (user_details.get("name"), session_id))
+
+    @staticmethod
+    def _message(session_id, user_name, line, created):
+        speaker, text = split_speaker(line)
+        return (
+            "INSERT INTO messages (session_id, user_name, created, speaker, text) VALUES (?, ?, ?, ?, ?)",
+            (session_id, user_name, created, speaker, text)
+        )
+
+    def append(self, session_id, user_name, line, created=None):
+        """Queues one "Speaker: text" line of a saved session."""
+        self._queue(*self._message(session_id, user_name, line, created or time.time()))
+
+    def save_session(self, session_id, user_details=None, lines=()):
+        """
+        Keeps a session: writes it now, with the lines held in memory until the user saved it.
+
+        :param user_details: Details collected at onboarding (the name is used for per-user queries).
+        :param lines: (created, "Speaker: text") pairs not written yet, oldest first.
+        """
+        user_details = user_details or {}
+        user_name = user_details.get("name")
+        statements = [(
+            "INSERT INTO sessions (session_id, user_name, details, started, saved) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT (session_id) DO UPDATE SET saved = 1",
+            (session_id, user_name, json.dumps(user_details), lines[0][0] if lines else time.time())
+        )]
+        statements += [self._message(session_id, user_name, line, created) for created, line in lines]
+        self._queue_many(statements)
+        self.flush()
+
+    def end_session(self, session_id):
+        """Records the end of a saved session."""
+        self._queue("UPDATE sessions SET ended = COALESCE(ended, ?) WHERE session_id = ?", (time.time(), session_id))
+        self.flush()
+
+    def delete_session(self, session_id):
+        self._queue("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        self._queue("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self.flush()
+
+    def park(self, session_id, state):
+        """Stores the JSON-serializable state of an idle session until it is resumed."""
+        self._queue(
+            "INSERT OR REPLACE INTO parked_sessions (session_id, state, parked) VALUES (?, ?, ?)",
+            (session_id, json.dumps(state), time.time())
+        )
+
+    def unpark(self, session_id):
+        """Removes and returns the parked state of a session, or None if it is not parked."""
+        rows = self._query("SELECT state FROM parked_sessions WHERE session_id = ?", (session_id,))
+        if not rows:
+            return None
+        self._queue("DELETE FROM parked_sessions WHERE session_id = ?", (session_id,))
+        return json.loads(rows[0][0])
+
+    def is_parked(self, session_id):
+        return bool(self._query("SELECT 1 FROM parked_sessions WHERE session_id = ?", (session_id,)))
+
+    def forget_parked(self, session_id):
+        self._queue("DELETE FROM parked_sessions WHERE session_id = ?", (session_id,))
+
+    def parked_count(self):
+        return self._query("SELECT COUNT(*) FROM parked_sessions", ())[0][0]
+
+    def _purge_parked(self, before):
+        """Deletes parked states older than `before`. Caller holds the lock."""
+        with self._db:
+            self._db.execute("DELETE FROM parked_sessions WHERE parked < ?", (before,))
+
+    # **Queries (pending writes are flushed first, so they are always visible)**
+
+    def _query(self, sql, parameters):
+        self.flush()
+        db = self._connection()
+        with self._db_lock:
+            return db.execute(sql, parameters).fetchall()
+
+    def session_messages(self, session_id):
+        """Returns the "Speaker: text" lines of a session, in order."""
+        rows = self._query("SELECT speaker, text FROM messages WHERE session_id = ? ORDER BY id", (session_id,))
+        return [f"{speaker}: {text}" if speaker else text for speaker, text in rows]
+
+    def user_sessions(self, user_name, since=None, until=None, saved_only=True):
+        """Returns the sessions of a user started in [since, until), newest first, as dicts."""
+        rows = self._query(
+            "SELECT session_id, details, started, ended, saved FROM sessions "
+            "WHERE user_name = ? AND started >= ? AND started < ? AND saved >= ? ORDER BY started DESC",
+            (user_name, since or 0, until or float("inf"), 1 if saved_only else 0)
+        )
+        return [
+            {"session_id": row[0], "details": json.loads(row[1] or "{}"), "started": row[2], "ended": row[3], "saved": bool(row[4])}
+            for row in rows
+        ]
+
+    def user_messages(self, user_name, since=None, until=None, limit=1000):
+        """Returns (created, session_id, speaker, text) rows of a user in [since, until), oldest first."""
+        return self._query(
+            "SELECT created, session_id, speaker, text FROM messages "
+            "WHERE user_name = ? AND created >= ? AND created < ? ORDER BY created LIMIT ?",
+            (user_name, since or 0, until or float("inf"), limit)
+        )
+
+    def messages_between(self, since, until, limit=1000):
+        """Returns (created, session_id, user_name, speaker, text) rows of every user in [since, until)."""
+        return self._query(
+            "SELECT created, session_id, user_name, speaker, text FROM messages "
+            "WHERE created >= ? AND created < ? ORDER BY created LIMIT ?",
+            (since, until, limit)
+        )
+
+
+class SessionLog:
+    """
+    Transcript of the live session: the last `maxlen` lines in memory, every line kept once saved.
+
+    Iterating yields the buffered lines, oldest first. Until save() is called, every line of
+    the session is held in memory only. save() writes them all, and later lines are written
+    as they arrive.
+
+    :param store: SessionStore receiving the lines of a saved session.
+    :param user_details: Details collected at onboarding (the name is used for per-user queries).
+    :param maxlen: Number of lines kept in memory once the session is saved.
+    :param session_id: Id of the session in the store. A new one is generated if not given.
+    :param saved: True if the session is already saved in the store (a resumed session).
+    """
+
+    __slots__ = ("store", "user_details", "session_id", "_saved", "_lines", "_unsaved")
+
+    def __init__(self, store, user_details=None, maxlen=LIVE_BUFFER_MESSAGES, session_id=None, saved=False):
+        self.store = store
+        self.user_details = dict(user_details or {})
+        self.session_id = session_id or uuid.uuid4().hex
+        self._saved = saved
+        self._lines = deque(maxlen=maxlen)
+        self._unsaved = []  # (created, line) of every line before the session is saved; never on disk
+
+    @property
+    def saved(self):
+        return self._saved
+
+    def set_user(self, user_details):
+        self.user_details = dict(user_details)
+        if self._saved:
+            self.store.update_user(self.session_id, self.user_details)
+
+    def append(self, line):
+        self._lines.append(line)
+        if self._saved:
+            self.store.append(self.session_id, self.user_details.get("name"), line)
+        else:
+            self._unsaved.append((time.time(), line))
+
+    def restore(self, lines):
+        """Refills the in-memory buffer of a resumed session, without writing to the store."""
+        self._lines.extend(lines)
+
+    def save(self):
+        """Writes the session and every line so far to the store, and returns its id."""
+        self.store.save_session(self.session_id, self.user_details, self._unsaved)
+        self._unsaved = []
+        self._saved = True
+        return self.session_id
+
+    def end(self):
+        """Ends the session: recorded in the store if it was saved, dropped otherwise."""
+        if self._saved:
+            self.store.end_session(self.session_id)
+        self._unsaved = []
+
+    def discard(self):
+        """Removes the session from the store and from memory."""
+        if self._saved:
+            self.store.delete_session(self.session_id)
+            self._saved = False
+        self._unsaved = []
+
+    def full_transcript(self):
+        """Every line of the session, including those no longer buffered in memory."""
+        if not self._saved:
+            return [line for _, line in self._unsaved]
+        return self.store.session_messages(self.session_id)
+
+    def memory_bytes(self):
+        """Approximate memory held by the buffered and unsaved lines, in bytes."""
+        unsaved = sys.getsizeof(self._unsaved) + sum(sys.getsizeof(line) + 80 for _, line in self._unsaved)
+        return sys.getsizeof(self._lines) + sum(sys.getsizeof(line) for line in list(self._lines)) + unsaved
+
+    def __iter__(self):
+        return iter(list(self._lines))
+
+    def __len__(self):
+        return len(self._lines)
+
+
+# **Process-wide store shared by the CLI and the Streamlit app**
+session_store = SessionStore()
\ No newline at end of file
@@ -0,0 +1,303 @@
+"""
+Multi-user session manager for the therapist bot.
+
+therapist.py kept session_log, conversation_memory and user_details as module
+globals, so one process could only serve one conversation safely. Here each
+conversation is a SessionState: a __slots__ object holding the user's details,
+the bounded conversation window (ConversationState) and the bounded session log
+(SessionLog). The SessionManager hosts many sessions in one process. All of them
+share the models loaded once by the registry. A lock per session serializes the
+turns of a conversation, while different conversations run concurrently.
+
+Memory cost per live session (t5-small, measured with SessionState.memory_bytes):
+
+- about 2 KB fixed: the state objects, the two deques and the user details;
+- the text of the context window and of the last LOG_BUFFER_MESSAGES log lines,
+  i.e. about 50 bytes plus one byte per character for each line (2-6 KB for a
+  typical chat). Until the user saves, every line of the log stays in memory
+  (about 130 bytes plus its text per line), since nothing is written to disk
+  without their consent;
+- with ENCODER_CACHE=1, the cached encoder outputs of the context window: 2 KB
+  per token (512 float32 values), i.e. 100-400 KB while a conversation is
+  active. They are freed when a session is idle for ENCODER_CACHE_IDLE_SECONDS
+  and recomputed by the next turn.
+
+An idle session therefore costs under 10 KB, and one worker can host thousands
+of them. Saved sessions idle for SESSION_IDLE_SECONDS, and the least recently
+used ones beyond MAX_LIVE_SESSIONS, are parked in the session store (0 bytes in
+memory) and resumed transparently on their next turn. Unsaved sessions are
+never parked, since that would write them to disk: they stay in memory until
+UNSAVED_IDLE_SECONDS of inactivity, or until they are the least recently used
+ones beyond MAX_LIVE_SESSIONS once every saved session is parked, and are then
+dropped. dropped() tells the apps to show a notice.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from conversation import ConversationState
+from session_store import SessionLog, session_store
+
+# **Session manager settings (overridable through environment variables)**
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", 600))  # Idle saved sessions are parked on disk after this
+ENCODER_CACHE_IDLE_SECONDS = float(os.environ.get("ENCODER_CACHE_IDLE_SECONDS", 60))  # Idle sessions free their encoder outputs
+MAX_LIVE_SESSIONS = int(os.environ.get("MAX_LIVE_SESSIONS", 5000))  # Least recently used sessions beyond this are parked
+UNSAVED_IDLE_SECONDS = float(os.environ.get("UNSAVED_IDLE_SECONDS", 24 * 3600))  # Idle unsaved sessions are dropped
+DROPPED_SESSIONS_REMEMBERED = 10000  # Ids of dropped sessions kept to explain why they are gone
+LOG_BUFFER_MESSAGES = 20  # Log lines kept in memory per session; the full log is in the session store
+
+
+class SessionState:
+    """
+    State of one conversation.
+
+    :param session_id: Id of the session, shared with the session store.
+    :param memory: ConversationState with the context window.
+    :param log: SessionLog of the session.
+    """
+
+    __slots__ = ("session_id", "memory", "log", "last_active", "lock")
+
+    def __init__(self, session_id, memory, log):
+        self.session_id = session_id
+        self.memory = memory
+        self.log = log
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def user_details(self):
+        return self.log.user_details
+
+    def to_parked(self):
+        """Returns the JSON-serializable state stored while the session is parked."""
+        return {
+            "user_details": self.log.user_details,
+            "memory": list(self.memory),
+            "log": list(self.log),
+            "saved": self.log.saved
+        }
+
+    def memory_bytes(self):
+        """Approximate memory held by the session, in bytes."""
+        details = sum(len(str(key)) + len(str(value)) + 100 for key, value in self.log.user_details.items())
+        return 200 + details + self.memory.memory_bytes() + self.log.memory_bytes()
+
+
+class SessionManager:
+    """
+    Hosts many therapist sessions in one process, with shared models and idle eviction.
+
+    :param get_model: Accessor returning the shared (tokenizer, model) pair used by every session.
+    :param store: SessionStore holding the logs and the parked sessions.
+    :param idle_seconds: Idle time after which a saved session is parked.
+    :param encoder_idle_seconds: Idle time after which a session frees its encoder outputs.
+    :param max_live_sessions: Maximum number of sessions kept in memory.
+    :param unsaved_idle_seconds: Idle time after which an unsaved session is dropped.
+    """
+
+    def __init__(self, get_model, store=session_store, idle_seconds=SESSION_IDLE_SECONDS,
+                 encoder_idle_seconds=ENCODER_CACHE_IDLE_SECONDS, max_live_sessions=MAX_LIVE_SESSIONS,
+                 unsaved_idle_seconds=UNSAVED_IDLE_SECONDS):
+        self.get_model = get_model
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self.encoder_idle_seconds = encoder_idle_seconds
+        self.max_live_sessions = max_live_sessions
+        self.unsaved_idle_seconds = unsaved_idle_seconds
+        self._dropped = OrderedDict()  # Ids of unsaved sessions dropped from memory, oldest first
+        self._sessions = OrderedDict()  # session_id -> SessionState, least recently used first
+        self._lock = threading.RLock()
+        self._reaper = None
+        self._stopped = False
+        self.parked = 0
+        self.resumed = 0
+        self.dropped_unsaved = 0
+
+    def _new_state(self, user_details=None, session_id=None, saved=False):
+        log = SessionLog(self.store, user_details, maxlen=LOG_BUFFER_MESSAGES, session_id=session_id, saved=saved)
+        return SessionState(log.session_id, ConversationState(self.get_model), log)
+
+    def _start_reaper(self):
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._run_reaper, name="session-reaper", daemon=True)
+            self._reaper.start()
+            atexit.register(self.close)
+
+    def _run_reaper(self):
+        interval = max(1.0, min(self.idle_seconds, self.encoder_idle_seconds) / 2)
+        while not self._stopped:
+            time.sleep(interval)
+            self.evict_idle()
+
+    def create(self, user_details=None):
+        """Starts a new session and returns its id."""
+        state = self._new_state(user_details)
+        with self._lock:
+            self._sessions[state.session_id] = state
+            self._start_reaper()
+        self._evict_overflow()
+        return state.session_id
+
+    def exists(self, session_id):
+        """Returns True if the session is live or parked."""
+        with self._lock:
+            if session_id in self._sessions:
+                return True
+        return self.store.is_parked(session_id)
+
+    def _get(self, session_id):
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+                state.last_active = time.monotonic()
+                return state
+            parked = self.store.unpark(session_id)
+            if parked is None:
+                if session_id in self._dropped:
+                    raise KeyError(f"Error: session {session_id} was not saved and ended after being idle")
+                raise KeyError(f"Error: unknown session {session_id}")
+            state = self._new_state(parked["user_details"], session_id=session_id, saved=parked["saved"])
+            for message in parked["memory"]:
+                state.memory.append(message)
+            state.log.restore(parked["log"])
+            self._sessions[session_id] = state
+            self.resumed += 1
+        self._evict_overflow()
+        return state
+
+    @contextmanager
+    def session(self, session_id):
+        """
+        Context manager giving exclusive access to a session, resuming it if it was parked.
+
+        :raises KeyError: If the session does not exist (ended, dropped unsaved, or parked too long ago).
+        """
+        while True:
+            state = self._get(session_id)
+            state.lock.acquire()
+            with self._lock:
+                if self._sessions.get(session_id) is state:
+                    break
+            # Parked between the lookup and the lock: resume it again
+            state.lock.release()
+        try:
+            state.last_active = time.monotonic()
+            yield state
+        finally:
+            state.last_active = time.monotonic()
+            state.lock.release()
+
+    def save(self, session_id):
+        """Keeps the session's log in the session store and returns its id."""
+        with self.session(session_id) as state:
+            return state.log.save()
+
+    def end(self, session_id, discard=False):
+        """
+        Removes a session from the manager.
+
+        :param discard: Also delete its log if it was saved. An unsaved log only lives in memory and is dropped.
+        """
+        with self._lock:
+            state = self._sessions.pop(session_id, None)
+        self.store.forget_parked(session_id)
+        if discard:
+            if state is None:
+                self.store.delete_session(session_id)
+            else:
+                state.log.discard()
+        elif state is None:
+            self.store.end_session(session_id)
+        else:
+            state.log.end()
+
+    def dropped(self, session_id):
+        """Returns True if the session was unsaved and dropped from memory, so the user can be told."""
+        with self._lock:
+            return session_id in self._dropped
+
+    def _park(self, session_id, state, drop_unsaved=False):
+        """
+        Writes a saved session to the store and drops it from memory. Caller holds the manager lock.
+
+        Unsaved sessions are never written to disk: they are only dropped, with `drop_unsaved`.
+        """
+        if not state.log.saved and not drop_unsaved:
+            return False
+        if not state.lock.acquire(blocking=False):
+            return False  # A turn is running; try again later
+        try:
+            if state.log.saved:
+                self.store.park(session_id, state.to_parked())
+                self.parked += 1
+            else:
+                state.log.end()
+                self._dropped[session_id] = True
+                while len(self._dropped) > DROPPED_SESSIONS_REMEMBERED:
+                    self._dropped.popitem(last=False)
+                self.dropped_unsaved += 1
+            del self._sessions[session_id]
+            return True
+        finally:
+            state.lock.release()
+
+    def _evict_overflow(self):
+        with self._lock:
+            # Saved sessions are parked first; unsaved ones are only dropped when that is not enough
+            for drop_unsaved in (False, True):
+                for session_id in list(self._sessions):
+                    if len(self._sessions) <= self.max_live_sessions:
+                        return
+                    self._park(session_id, self._sessions[session_id], drop_unsaved)
+
+    def evict_idle(self):
+        """
+        Parks idle saved sessions, drops unsaved ones idle for UNSAVED_IDLE_SECONDS, and frees the
+        encoder outputs of the other idle sessions.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for session_id, state in list(self._sessions.items()):
+                idle = now - state.last_active
+                if idle >= self.unsaved_idle_seconds and self._park(session_id, state, drop_unsaved=True):
+                    continue
+                if idle >= self.idle_seconds and self._park(session_id, state):
+                    continue
+                if idle >= self.encoder_idle_seconds and state.lock.acquire(blocking=False):
+                    try:
+                        state.memory.drop_encoder_outputs()
+                    finally:
+                        state.lock.release()
+
+    def close(self):
+        """
+        Parks every saved live session, so that they survive a restart. Unsaved sessions are dropped.
+
+        Parked sessions that are not resumed are purged after PARKED_RETENTION_SECONDS.
+        """
+        self._stopped = True
+        with self._lock:
+            for session_id, state in list(self._sessions.items()):
+                self._park(session_id, state, drop_unsaved=True)
+        self.store.flush()
+
+    def stats(self):
+        """Returns the number of live and parked sessions and the memory held by live ones."""
+        with self._lock:
+            states = list(self._sessions.values())
+        memory = sum(state.memory_bytes() for state in states)
+        return {
+            "live_sessions": len(states),
+            "parked_sessions": self.store.parked_count(),
+            "memory_bytes": memory,
+            "bytes_per_session": memory / len(states) if states else 0,
+            "parked": self.parked,
+            "resumed": self.resumed,
+            "dropped_unsaved": self.dropped_unsaved
+        }
\ No newline at end of file
@@ -1,22 +1,43 @@
-import torch
-import datetime
 import os
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+import sys
+from transformers import AutoModelForSeq2SeqLM
+
+from moderation import moderate
+from session_store import session_store
+from sessions import SessionManager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.onnx_backend import get_seq2seq_tokenizer_and_model
 
 
 MODEL_NAME = "t5-small"  # Alternative lightweight model
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
 
 
-# **Sentiment Analysis & Toxicity Filter**
-sentiment_analyzer = pipeline("sentiment-analysis")
-toxicity_classifier = pipeline("text-classification", model="facebook/roberta-hate-speech-dynabench-r4-target")
+def get_therapist_model():
+    """Returns the shared (tokenizer, model) pair of the therapist model, loading it on first use."""
+    return get_seq2seq_tokenizer_and_model(MODEL_NAME, AutoModelForSeq2SeqLM)
+
+
+def generate_response(conversation, emotional_prompt, user_input):
+    """
+    Generates the therapist's reply.
 
-# **Session Log (For Memory Retention)**
-session_log = []
-conversation_memory = []
-user_details = {}
+    :param conversation: ConversationState holding the recent messages, the user's message included.
+    :param emotional_prompt: Instruction matching the user's sentiment.
+    :param user_input: The user's message.
+    """
+    return conversation.generate(
+        f"{emotional_prompt} {user_input}",
+        max_length=150,  # Prevents overly long responses
+        temperature=0.7,  # Encourages variety in responses
+        top_p=0.92,  # Uses nucleus sampling for natural replies
+        do_sample=True  # Enables better randomness
+    )
+
+
+# **Sessions (For Memory Retention)**
+# Every conversation has its own state; all of them share the therapist model
+session_manager = SessionManager(get_therapist_model, session_store)
 
 
 def ask_user_details():
@@ -27,27 +48,38 @@ def ask_user_details():
     location = input("Where are you from? ").strip() or "Somewhere"
     reason = input("What brings you here today? (e.g., stress, anxiety, personal growth) ").strip()
 
-    global user_details
-    user_details = {"name": name, "age": age, "location": location, "reason": reason}
-
     print(f"\n👋 Hello {name} from {location}! I'm here to support you. Let's talk.")
+    return {"name": name, "age": age, "location": location, "reason": reason}
 
 
 def analyze_sentiment(user_input):
     """Uses a sentiment analysis model to detect user emotions."""
-    result = sentiment_analyzer(user_input)[0]
-    return result["label"], result["score"]
+    result = moderate(user_input, toxicity=False)
+    return result["sentiment"], result["sentiment_score"]
 
 
 def detect_toxicity(user_input):
     """Detects if a response is toxic, offensive, or inappropriate."""
-    toxicity_result = toxicity_classifier(user_input)[0]
-    return toxicity_result["label"] == "hate_speech", toxicity_result["score"]
+    result = moderate(user_input, sentiment=False)
+    return result["toxic"], result["toxicity_score"]
+
 
+def screen_message(user_input):
+    """
+    Classifies a user message for toxicity and sentiment in one moderation stage.
 
-def generate_emotional_prompt(user_input):
+    The sentiment is cached, so generate_emotional_prompt does not classify the message again.
+
+    :return: (is_toxic, toxicity_score), like detect_toxicity.
+    """
+    result = moderate(user_input)
+    return result["toxic"], result["toxicity_score"]
+
+
+def generate_emotional_prompt(user_input, user_details=None):
     """Adjusts response tone based on detected sentiment."""
     sentiment, confidence = analyze_sentiment(user_input)
+    user_details = user_details or {}
 
     emotion_responses = {
         "POSITIVE": f"I'm happy to hear that, {user_details.get('name', 'Friend')}! What’s been making you feel this way?",
@@ -58,26 +90,55 @@ def generate_emotional_prompt(user_input):
     return emotion_responses.get(sentiment, "I'm here to listen and support you.")
 
 
-def save_conversation():
-    """Saves the conversation log to a file."""
-    if not os.path.exists("therapy_sessions"):
-        os.makedirs("therapy_sessions")
+def therapist_turn(session, user_input):
+    """
+    Runs one turn of a session: screening, reply generation and logging.
+
+    :param session: SessionState of the conversation (see sessions.py).
+    :param user_input: The user's message.
+    :return: The therapist's reply, or None if the message was flagged as harmful (it is logged redacted).
+    """
+    # **Detect Toxic or Harmful Speech**
+    is_toxic, toxicity_score = screen_message(user_input)
+    if is_toxic:
+        session.log.append(f"You: [REDACTED TOXIC CONTENT]")
+        return None
+
+    # **Generate Emotionally Intelligent Prompt**
+    emotional_prompt = generate_emotional_prompt(user_input, session.user_details)
+
+    # **Store Conversation History**
+    session.memory.append(f"You: {user_input}")
+    session.log.append(f"You: {user_input}")
+
+    # **Generate AI Response with Context Awareness (only the new turn is encoded)**
+    response = generate_response(session.memory, emotional_prompt, user_input)
+
+    # **Check for Toxicity in AI Response**
+    is_toxic, toxicity_score = detect_toxicity(response)
+    if is_toxic:
+        response = "I'm here to help in a supportive and respectful way. Let's focus on healing. 💙"
 
-    filename = f"therapy_sessions/therapy_session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    with open(filename, "w", encoding="utf-8") as file:
-        for line in session_log:
-            file.write(line + "\n")
-    print(f"\n💾 Your session has been saved as `{filename}`.")
+    # **Enhance Response to Sound More Empathetic**
+    response = response.replace("I am", "I'm").replace("do not", "don't").replace("you are", "you're")
+
+    # **Update Chat Memory & Log**
+    session.memory.append(f"Therapist: {response}")
+    session.log.append(f"Therapist: {response}")
+    return response
+
+
+def save_conversation(session_id):
+    """Keeps the conversation log in the session store."""
+    session_id = session_manager.save(session_id)
+    print(f"\n💾 Your session has been saved as `{session_id}` in `{session_store.path}`.")
 
 
 def chat_with_therapist():
     """Runs an AI-powered therapist chatbot with context retention."""
-    ask_user_details()
+    session_id = session_manager.create(ask_user_details())
     print("\n🤖 **Serenity AI** – I'm here to listen and help. Type 'exit' to end the session.")
 
-    global conversation_memory
-    conversation_memory = []
-
     while True:
         # **User Input**
         user_input = input("\nYou: ").strip()
@@ -85,60 +146,24 @@ def chat_with_therapist():
             print("\n🧘‍♂️ Take care! If you ever need to talk, I'm here. 💙")
             save_choice = input("💾 Do you want to save this conversation? (yes/no): ").strip().lower()
             if save_choice in ["yes", "y"]:
-                save_conversation()
+                save_conversation(session_id)
+                session_manager.end(session_id)
+            else:
+                session_manager.end(session_id, discard=True)
             break
 
-        # **Detect Toxic or Harmful Speech**
-        is_toxic, toxicity_score = detect_toxicity(user_input)
-        if is_toxic:
+        try:
+            with session_manager.session(session_id) as session:
+                response = therapist_turn(session, user_input)
+        except KeyError:
+            print("\n⌛ This session was not saved and ended after a period of inactivity. Nothing of it was stored.")
+            break
+        if response is None:
             print("\n⚠️ AI detected harmful language. Let's focus on positive healing. 💙")
-            session_log.append(f"You: [REDACTED TOXIC CONTENT]")
             continue
 
-        # **Generate Emotionally Intelligent Prompt**
-        emotional_prompt = generate_emotional_prompt(user_input)
-
-        # **Store Conversation History**
-        conversation_memory.append(f"You: {user_input}")
-        session_log.append(f"You: {user_input}")
-
-        # **Ensure Context Retains Last 6 Messages**
-        conversation_memory = conversation_memory[-6:]
-
-        # **Tokenize Input & Add Emotional Prompt**
-        input_text = " ".join(conversation_memory) + f" {emotional_prompt} {user_input}"
-        input_ids = tokenizer(input_text, return_tensors="pt")
-
-        # **Generate AI Response with Context Awareness**
-        with torch.no_grad():
-            response_ids = model.generate(
-                input_ids["input_ids"],
-                max_length=150,  # Prevents overly long responses
-                temperature=0.7,  # Encourages variety in responses
-                top_p=0.92,  # Uses nucleus sampling for natural replies
-                do_sample=True  # Enables better randomness
-            )
-
-        # **Decode AI Response**
-        response = tokenizer.decode(response_ids[0], skip_special_tokens=True)
-
-        # **Check for Toxicity in AI Response**
-        is_toxic, toxicity_score = detect_toxicity(response)
-        if is_toxic:
-            response = "I'm here to help in a supportive and respectful way. Let's focus on healing. 💙"
-
-        # **Enhance Response to Sound More Empathetic**
-        response = response.replace("I am", "I'm").replace("do not", "don't").replace("you are", "you're")
-
         print(f"\n🧑‍⚕️ Therapist: {response}")
 
-        # **Update Chat Memory & Log**
-        conversation_memory.append(f"Therapist: {response}")
-        session_log.append(f"Therapist: {response}")
-
-        # **Limit to Last 6 Messages**
-        conversation_memory = conversation_memory[-6:]
-
 
 if __name__ == "__main__":
-    chat_with_therapist()
+    chat_with_therapist()
\ No newline at end of file
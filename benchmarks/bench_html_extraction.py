@@ -0,0 +1,128 @@
+"""
+Benchmark: BeautifulSoup paragraph extraction vs the single-pass html_extractor.
+
+Usage:
+    python benchmarks/bench_html_extraction.py --corpus saved_pages/
+    python benchmarks/bench_html_extraction.py --corpus saved_pages/ --save https://example.com/article ...
+    python benchmarks/bench_html_extraction.py  # synthetic news-like pages
+
+The corpus is a directory of saved .html files. --save downloads the given URLs
+into the corpus directory first. Both extractors must produce identical text
+for every page; any difference is reported.
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import time
+
+import requests
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Text Summarizer"))
+from html_extractor import extract_paragraph_text
+
+
+def beautifulsoup_text(html):
+    """The original fetch_text_from_url extraction."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in ["nav", "aside", "footer", "header", "script", "style"]:
+        for element in soup.find_all(tag):
+            element.extract()
+    paragraphs = soup.find_all("p")
+    return "\n".join([para.get_text(strip=True) for para in paragraphs])
+
+
+def synthetic_page(rng, paragraphs=120):
+    """Builds a heavy news-like page: menus, inline scripts, styled asides and long articles."""
+    words = "the market city council report said on monday that new data would be published later this year".split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 25))).capitalize() + "."
+
+    parts = ["<!DOCTYPE html><html><head><title>News</title><style>body{font:14px sans-serif}</style>"]
+    parts.append("<script>" + "var x = 1 < 2 && {a: 'b'};" * 200 + "</script></head><body>")
+    parts.append("<header><nav><ul>" + "".join(f"<li><a href='/s{i}'>Section {i}</a></li>" for i in range(60)) + "</ul></nav></header>")
+    parts.append("<main><article>")
+    for index in range(paragraphs):
+        parts.append(f"<p class='body'>{sentence()} <a href='/l{index}'>{sentence()}</a> <b>{sentence()}</b> &amp; &quot;quoted&quot;</p>")
+        if index % 15 == 0:
+            parts.append("<aside class='ad'><p>Advertisement</p><img src='ad.png'><script>track();</script></aside>")
+        if index % 7 == 0:
+            parts.append(f"<div class='figure'><img src='i{index}.jpg'><span>{sentence()}</span></div>")
+    parts.append("</article></main>")
+    parts.append("<footer><p>Copyright</p>" + "".join(f"<a href='/f{i}'>Link {i}</a>" for i in range(80)) + "</footer>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def load_corpus(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            pages.append((os.path.basename(path), file.read()))
+    return pages
+
+
+def save_pages(urls, directory):
+    os.makedirs(directory, exist_ok=True)
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
+    for index, url in enumerate(urls):
+        response = requests.get(url, headers=headers, timeout=10)
+        response.raise_for_status()
+        with open(os.path.join(directory, f"page_{index:04d}.html"), "w", encoding="utf-8") as file:
+            file.write(response.text)
+
+
+def time_per_page(extract, pages, repeats):
+    """Returns the median seconds per page over `repeats` passes."""
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        for _, html in pages:
+            extract(html)
+        timings.append((time.perf_counter() - began) / len(pages))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of saved .html pages")
+    parser.add_argument("--save", nargs="+", metavar="URL", help="Download these URLs into --corpus first")
+    parser.add_argument("--pages", type=int, default=30, help="Synthetic pages when no corpus is given")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.save:
+        if not args.corpus:
+            parser.error("--save needs --corpus")
+        save_pages(args.save, args.corpus)
+
+    if args.corpus:
+        pages = load_corpus(args.corpus)
+        if not pages:
+            parser.error(f"No .html files in {args.corpus}")
+    else:
+        rng = random.Random(0)
+        pages = [(f"synthetic_{index}", synthetic_page(rng)) for index in range(args.pages)]
+
+    mismatches = [name for name, html in pages if beautifulsoup_text(html) != extract_paragraph_text(html)]
+
+    average_kb = sum(len(html) for _, html in pages) / len(pages) / 1024
+    baseline = time_per_page(beautifulsoup_text, pages, args.repeats)
+    single_pass = time_per_page(extract_paragraph_text, pages, args.repeats)
+
+    print(f"Pages: {len(pages)} (average {average_kb:.0f} KB)")
+    print(f"BeautifulSoup html.parser: {baseline * 1000:8.2f} ms/page")
+    print(f"Single-pass extractor:     {single_pass * 1000:8.2f} ms/page")
+    print(f"Speedup:                   {baseline / single_pass:8.2f}x")
+    print(f"Identical output:          {len(pages) - len(mismatches)}/{len(pages)}")
+    for name in mismatches:
+        print(f"  differs: {name}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Benchmark: fp32 vs int8 dynamic quantization for the model of every app.
+
+Usage:
+    python benchmarks/bench_quantization.py
+    python benchmarks/bench_quantization.py --apps summarizer therapist --runs 5
+    python benchmarks/bench_quantization.py --model story=/path/to/local/distilgpt2
+
+Every (model, mode) pair is measured in a fresh subprocess, so RSS reflects
+one loaded model only. Generation is greedy, so any difference between the
+fp32 and int8 outputs is quantization drift. Drift is reported as the share of
+prompts with a different output and the mean character-level dissimilarity.
+"""
+
+import argparse
+import difflib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# App -> (pipeline task, model, generation kwargs, prompts)
+APP_MODELS = {
+    "summarizer": (
+        "summarization", "facebook/bart-large-cnn",
+        {"max_length": 120, "min_length": 30, "do_sample": False, "truncation": True},
+        [
+            "The city council met on Monday to discuss the new budget. Members debated funding for schools, roads and "
+            "public transport for more than four hours. The final vote was postponed until next week after residents "
+            "asked for more time to review the proposal and the mayor promised to publish the full figures online.",
+            "Researchers have developed a battery that charges in five minutes and keeps 90 percent of its capacity "
+            "after a thousand cycles. The team says the design relies on cheap materials and could reach electric "
+            "cars within a few years, although manufacturing at scale remains an open question."
+        ]
+    ),
+    "corrector": (
+        "text2text-generation", "grammarly/coedit-large",
+        {"max_length": 128, "do_sample": False},
+        [
+            "Fix the grammar and make this text formal: she dont like going to school on mondays.",
+            "Fix the grammar and make this text simple: Their going too the park tomorow with there friends."
+        ]
+    ),
+    "quiz_recipe": (
+        "text-generation", "gpt2-medium",
+        {"max_length": 80, "do_sample": False},
+        ["Write a complete recipe for pancakes.", "Question 1: What is machine learning?\nA."]
+    ),
+    "story": (
+        "text-generation", "distilgpt2",
+        {"max_length": 80, "do_sample": False},
+        ["Write a captivating fantasy story with the theme of friendship.\n\nOnce upon a time, "]
+    ),
+    "code": (
+        "text-generation", "Salesforce/codegen-350M-mono",
+        {"max_length": 96, "do_sample": False},
+        ["# Python function that returns the n-th Fibonacci number\ndef fibonacci(n):"]
+    ),
+    "therapist": (
+        "text2text-generation", "t5-small",
+        {"max_length": 60, "do_sample": False},
+        ["You: I feel stressed about my exams. Respond with empathy and encouragement."]
+    ),
+}
+
+
+def rss_mb():
+    """Current resident set size of this process, in MB."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import psutil
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def run_worker(app, model, dtype, runs):
+    """Loads one model in one mode, times it and prints a JSON report."""
+    sys.path.append(ROOT)
+    from shared.registry import get_pipeline, model_memory_bytes
+
+    task, _, generation_kwargs, prompts = APP_MODELS[app]
+    rss_before = rss_mb()
+    began = time.perf_counter()
+    pipe = get_pipeline(task, model=model, dtype=dtype)
+    load_seconds = time.perf_counter() - began
+
+    outputs = [pipe(prompt, **generation_kwargs)[0] for prompt in prompts]  # Warm-up, and the outputs to compare
+    outputs = [output.get("summary_text", output.get("generated_text", "")) for output in outputs]
+    latencies = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        for prompt in prompts:
+            pipe(prompt, **generation_kwargs)
+        latencies.append((time.perf_counter() - began) / len(prompts))
+
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "latency_seconds": statistics.median(latencies),
+        "rss_mb": rss_mb() - rss_before,
+        "weights_mb": model_memory_bytes(pipe.model) / (1024 * 1024),
+        "outputs": outputs
+    }))
+
+
+def measure(app, model, dtype, runs):
+    command = [sys.executable, os.path.abspath(__file__), "--worker", app, model, dtype or "fp32", "--runs", str(runs)]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "worker failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def drift(reference, candidate):
+    """Returns (share of differing outputs, mean 1 - similarity ratio)."""
+    changed = sum(1 for a, b in zip(reference, candidate) if a != b) / len(reference)
+    dissimilarity = statistics.mean(
+        1 - difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(reference, candidate)
+    )
+    return changed, dissimilarity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="+", choices=sorted(APP_MODELS), default=sorted(APP_MODELS))
+    parser.add_argument("--runs", type=int, default=3, help="Timed passes over the prompts")
+    parser.add_argument("--model", action="append", default=[], metavar="APP=PATH", help="Use another model for an app")
+    parser.add_argument("--worker", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        app, model, mode = args.worker
+        run_worker(app, model, None if mode == "fp32" else mode, args.runs)
+        return
+
+    overrides = dict(item.split("=", 1) for item in args.model)
+    header = f"{'app':<12} {'mode':<6} {'latency ms':>11} {'load s':>7} {'RSS MB':>8} {'weights MB':>11} {'changed':>8} {'drift':>6}"
+    print(header)
+    print("-" * len(header))
+    for app in args.apps:
+        model = overrides.get(app, APP_MODELS[app][1])
+        try:
+            fp32 = measure(app, model, None, args.runs)
+            int8 = measure(app, model, "qint8", args.runs)
+        except RuntimeError as e:
+            print(f"{app:<12} skipped: {e}")
+            continue
+        changed, dissimilarity = drift(fp32["outputs"], int8["outputs"])
+        for mode, report in (("fp32", fp32), ("int8", int8)):
+            print(
+                f"{app:<12} {mode:<6} {report['latency_seconds'] * 1000:>11.1f} {report['load_seconds']:>7.1f} "
+                f"{report['rss_mb']:>8.0f} {report['weights_mb']:>11.0f}"
+                + (f" {changed:>8.0%} {dissimilarity:>6.3f}" if mode == "int8" else "")
+            )
+        print(f"{'':<12} speedup {fp32['latency_seconds'] / int8['latency_seconds']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
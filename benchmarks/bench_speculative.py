@@ -0,0 +1,115 @@
+"""
+Benchmark: CPU tokens/sec of speculative decoding (distilgpt2 drafting for gpt2-medium) against plain sampling.
+
+Usage:
+    python benchmarks/bench_speculative.py
+    python benchmarks/bench_speculative.py --apps recipe quiz --runs 5 --new-tokens 128
+    python benchmarks/bench_speculative.py --target /path/to/gpt2-medium --draft /path/to/distilgpt2
+
+The prompts are built with the apps' own templates. For every app, up to
+--new-tokens tokens are sampled with the apps' settings (temperature 0.7,
+top_p 0.9), once plainly and once with the draft model as assistant, from the
+same seeds. Tokens/sec counts the tokens actually generated. The acceptance
+rate and the tokens per target forward pass come from shared.speculative's
+statistics. A greedy run with and without the draft checks that verification
+leaves the output unchanged.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+for app_dir in ("RecipeGenerator", "QuizGenerator"):
+    sys.path.append(os.path.join(ROOT, app_dir))
+
+from shared.registry import get_pipeline
+from shared.speculative import DRAFT_MODEL_NAME, generate_with_draft, reset_stats, speculative_stats
+
+QUIZ_USER = {"name": "Sam", "age": "29", "country": "Canada"}
+
+
+def app_prompts():
+    """App -> prompt, built with the apps' own templates."""
+    import quiz
+    import recipe
+
+    return {
+        "recipe": recipe.build_recipe_prompt("eggs, spinach, feta", "Vegetarian", "Breakfast", "20", "2"),
+        "dish": "Write a complete recipe for Chicken Biryani.",
+        "quiz": quiz.build_quiz_prompt(QUIZ_USER, "IT", "Software Developer"),
+    }
+
+
+def tokens_per_second(function, tokenizer, runs, seed):
+    """Median tokens/sec of `runs` calls, each one seeded the same way for both variants."""
+    rates = []
+    for run in range(runs):
+        torch.manual_seed(seed + run)
+        start = time.perf_counter()
+        outputs = function()
+        seconds = time.perf_counter() - start
+        rates.append(len(tokenizer(outputs[0]["generated_text"])["input_ids"]) / seconds)
+    return statistics.median(rates)
+
+
+def bench_app(name, pipe, draft, prompt, runs, new_tokens, seed):
+    settings = {"max_new_tokens": new_tokens, "pad_token_id": pipe.tokenizer.eos_token_id, "return_full_text": False}
+    sampling = dict(settings, do_sample=True, temperature=0.7, top_p=0.9)
+
+    plain_greedy = pipe(prompt, do_sample=False, **settings)[0]["generated_text"]
+    assisted_greedy = generate_with_draft(pipe, draft, prompt, do_sample=False, **settings)[0]["generated_text"]
+    pipe(prompt, **sampling)  # Warm-up
+
+    reset_stats()
+    plain_tps = tokens_per_second(lambda: pipe(prompt, **sampling), pipe.tokenizer, runs, seed)
+    assisted_tps = tokens_per_second(
+        lambda: generate_with_draft(pipe, draft, prompt, name=name, **sampling), pipe.tokenizer, runs, seed
+    )
+    stats = speculative_stats()[name]
+    return {
+        "app": name,
+        "plain_tps": plain_tps,
+        "assisted_tps": assisted_tps,
+        "acceptance_rate": stats["acceptance_rate"],
+        "tokens_per_forward": stats["tokens_per_forward"],
+        "identical": plain_greedy == assisted_greedy
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="+", choices=["recipe", "dish", "quiz"])
+    parser.add_argument("--runs", type=int, default=3, help="Timed generations per app and variant")
+    parser.add_argument("--new-tokens", type=int, default=64, help="Maximum tokens sampled per generation")
+    parser.add_argument("--target", default="gpt2-medium", help="Target model (default: gpt2-medium)")
+    parser.add_argument("--draft", default=DRAFT_MODEL_NAME, help=f"Draft model (default: {DRAFT_MODEL_NAME})")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pipe = get_pipeline("text-generation", model=args.target)
+    draft = get_pipeline("text-generation", model=args.draft).model
+    print(
+        f"target {args.target}, draft {args.draft}, up to {args.new_tokens} tokens, "
+        f"{torch.get_num_threads()} CPU threads"
+    )
+    print(f"{'app':<8} {'plain tok/s':>11} {'assisted tok/s':>14} {'speed-up':>8} {'accepted':>8} "
+          f"{'tok/forward':>11} {'identical':>9}")
+
+    prompts = app_prompts()
+    for name in args.apps or list(prompts):
+        result = bench_app(name, pipe, draft, prompts[name], args.runs, args.new_tokens, args.seed)
+        print(
+            f"{result['app']:<8} {result['plain_tps']:>11.1f} {result['assisted_tps']:>14.1f} "
+            f"{result['assisted_tps'] / result['plain_tps']:>7.2f}x {result['acceptance_rate']:>8.0%} "
+            f"{result['tokens_per_forward']:>11.2f} {str(result['identical']):>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Helpers shared by the Prompt Engineering apps (model loading, caching, ...)."""
@@ -0,0 +1,254 @@
+"""
+Dynamic batching for model calls coming from concurrent Streamlit sessions.
+
+Every Streamlit session runs its script on its own thread, and each of them
+used to call the shared pipeline with a single input. Concurrent users
+therefore ran one forward pass after another. With dynamic batching enabled,
+calls go to a per-model worker thread instead. The worker collects the
+requests that arrive within a short window (BATCH_WINDOW_MS, up to
+MAX_BATCH_SIZE), runs requests with identical generation settings as one padded
+batch and hands every caller its own result through a Future.
+
+There is one batcher per model (and call type), so apps sharing a model, such
+as the recipe and quiz generators, share batches too. Batches are padded with a
+copy of the model's tokenizer; the shared tokenizer is never modified.
+
+Batching is opt-in (DYNAMIC_BATCHING=1): with a single user it only adds the
+window's latency. Without it, run_pipeline and run_generate call the model
+directly, exactly as before.
+"""
+
+import copy
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import torch
+
+# **Batching settings (overridable through environment variables)**
+DYNAMIC_BATCHING = os.environ.get("DYNAMIC_BATCHING", "").lower() in ("1", "true", "yes")
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", 10))  # How long the worker waits for more requests
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 8))  # Requests per forward pass
+
+
+def _settings_key(kwargs):
+    """Hashable key of a request's generation settings; only equal settings share a batch."""
+    return tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+
+
+class DynamicBatcher:
+    """
+    Collects single requests into batches and runs them on one worker thread.
+
+    :param run_batch: Callable taking (inputs, kwargs) and returning one output per input.
+    :param max_batch_size: Maximum number of requests per batch.
+    :param window_ms: Time the worker keeps collecting after the first request of a batch.
+    :param name: Name of the worker thread.
+    """
+
+    def __init__(self, run_batch, max_batch_size=MAX_BATCH_SIZE, window_ms=BATCH_WINDOW_MS, name="batcher"):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_ms / 1000
+        self.name = name
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, item, **kwargs):
+        """
+        Queues one input and returns a Future for its output.
+
+        :param item: One model input (a prompt or a document).
+        :param kwargs: Generation settings. Requests are only batched with requests using the same settings.
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, kwargs, _settings_key(kwargs), future))
+        return future
+
+    def __call__(self, item, **kwargs):
+        """Submits one input and waits for its output."""
+        return self.submit(item, **kwargs).result()
+
+    def stats(self):
+        """Returns the number of batches and requests processed so far."""
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0
+        }
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Blocks for the first request, then gathers more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            groups = OrderedDict()  # settings key -> requests, in arrival order
+            for request in self._collect():
+                groups.setdefault(request[2], []).append(request)
+
+            for requests in groups.values():
+                futures = [request[3] for request in requests]
+                try:
+                    outputs = self.run_batch([request[0] for request in requests], requests[0][1])
+                except Exception as e:
+                    for future in futures:
+                        future.set_exception(e)
+                    continue
+                outputs = list(outputs)
+                self.batches += 1
+                self.requests += len(requests)
+                for future, output in zip(futures, outputs):
+                    future.set_result(output)
+                # Never leave a caller waiting when the batch came back short
+                for future in futures[len(outputs):]:
+                    future.set_exception(
+                        RuntimeError(f"Error: the batch returned {len(outputs)} outputs for {len(requests)} inputs")
+                    )
+
+
+_batchers = weakref.WeakKeyDictionary()  # model -> {call type: DynamicBatcher}
+_padding_tokenizers = weakref.WeakKeyDictionary()  # shared tokenizer -> copy that pads batches
+_batching_pipelines = weakref.WeakKeyDictionary()  # shared pipeline -> copy using the padding tokenizer
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model, kind, run_batch, **options):
+    """
+    Returns the batcher of `model` for one call type, creating it with `run_batch` on first use.
+
+    :param model: The model the requests run on. Callers sharing a model share its batcher.
+    :param kind: Call type ("pipeline" or "generate"); their requests and outputs differ.
+    :param run_batch: Callable taking (inputs, kwargs) and returning one output per input.
+    """
+    with _batchers_lock:
+        batchers = _batchers.setdefault(model, {})
+        if kind not in batchers:
+            name = f"batcher-{kind}-{getattr(model, 'name_or_path', type(model).__name__)}"
+            batchers[kind] = DynamicBatcher(run_batch, name=name, **options)
+        return batchers[kind]
+
+
+def padding_tokenizer(tokenizer, model):
+    """
+    Returns a copy of a shared tokenizer that can pad batches for its model.
+
+    GPT-2 style tokenizers have no pad token; the end-of-sequence token is used
+    instead. Decoder-only models continue the last position of every row, so they
+    are padded on the left. Only the copy is changed, so callers of the shared
+    tokenizer are not affected.
+    """
+    with _batchers_lock:
+        padding = _padding_tokenizers.get(tokenizer)
+        if padding is None:
+            padding = copy.deepcopy(tokenizer)
+            if padding.pad_token is None:
+                padding.pad_token = padding.eos_token
+            if not model.config.is_encoder_decoder:
+                padding.padding_side = "left"
+            _padding_tokenizers[tokenizer] = padding
+        return padding
+
+
+def batching_pipeline(pipe):
+    """Returns a copy of a shared pipeline that runs on the same model but pads with padding_tokenizer."""
+    tokenizer = padding_tokenizer(pipe.tokenizer, pipe.model)
+    with _batchers_lock:
+        batching = _batching_pipelines.get(pipe)
+        if batching is None:
+            batching = copy.copy(pipe)
+            batching.tokenizer = tokenizer
+            _batching_pipelines[pipe] = batching
+        return batching
+
+
+def _pipeline_batch_runner(get_pipe):
+    def run_batch(inputs, kwargs):
+        pipe = batching_pipeline(get_pipe())
+        kwargs = dict(kwargs)
+        kwargs.setdefault("pad_token_id", pipe.tokenizer.pad_token_id)
+        return pipe(inputs, batch_size=len(inputs), **kwargs)
+    return run_batch
+
+
+def run_pipeline(get_pipe, inputs, **kwargs):
+    """
+    Calls get_pipe()(inputs, **kwargs), through the model's batcher when dynamic batching is enabled.
+
+    :param get_pipe: Accessor of the shared pipeline, e.g. get_summarizer.
+    :param inputs: One input or a list of inputs. Lists are split into single requests,
+                   so they can share batches with other sessions.
+    :param kwargs: Pipeline arguments. batch_size is decided by the batcher.
+    :return: The same structure the pipeline returns for `inputs`.
+    """
+    if not DYNAMIC_BATCHING:
+        return get_pipe()(inputs, **kwargs)
+
+    kwargs.pop("batch_size", None)
+    batcher = get_batcher(get_pipe().model, "pipeline", _pipeline_batch_runner(get_pipe))
+    if isinstance(inputs, str):
+        output = batcher(inputs, **kwargs)
+        # A pipeline returns a list for a single input, but a bare dict per item of a list
+        return output if isinstance(output, list) else [output]
+    futures = [batcher.submit(item, **kwargs) for item in inputs]
+    return [future.result() for future in futures]
+
+
+def _generate_batch_runner(get_tokenizer_and_model):
+    def run_batch(prompts, kwargs):
+        tokenizer, model = get_tokenizer_and_model()
+        tokenizer = padding_tokenizer(tokenizer, model)
+        encoded = tokenizer(prompts, return_tensors="pt", padding=True)
+        kwargs = dict(kwargs)
+        kwargs.setdefault("pad_token_id", tokenizer.pad_token_id)
+        with torch.no_grad():
+            output_ids = model.generate(
+                encoded["input_ids"], attention_mask=encoded["attention_mask"], **kwargs
+            )
+        return [tokenizer.decode(ids, skip_special_tokens=True) for ids in output_ids]
+    return run_batch
+
+
+def run_generate(get_tokenizer_and_model, prompt, **generate_kwargs):
+    """
+    Generates text for one prompt with model.generate, batched with concurrent calls when enabled.
+
+    :param get_tokenizer_and_model: Accessor returning the shared (tokenizer, model) pair.
+    :param prompt: The model input.
+    :param generate_kwargs: Arguments for model.generate (max_length, temperature, ...).
+    :return: The decoded output, special tokens removed.
+    """
+    if DYNAMIC_BATCHING:
+        model = get_tokenizer_and_model()[1]
+        batcher = get_batcher(model, "generate", _generate_batch_runner(get_tokenizer_and_model))
+        return batcher(prompt, **generate_kwargs)
+
+    tokenizer, model = get_tokenizer_and_model()
+    input_ids = tokenizer(prompt, return_tensors="pt")
+    with torch.no_grad():
+        output_ids = model.generate(input_ids["input_ids"], **generate_kwargs)
+    return tokenizer.decode(output_ids[0], skip_special_tokens=True)
\ No newline at end of file
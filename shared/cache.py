@@ -0,0 +1,202 @@
+"""
+Content-addressed cache for deterministic model results.
+
+Calls such as BART summarization or coedit-large correction run with
+`do_sample=False`, so the same input always produces the same output. Results
+are stored under a hash of the normalized input, the model id and the
+generation kwargs, first in an in-memory LRU tier and then in an on-disk
+SQLite tier that survives Streamlit reruns and restarts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# **Cache configuration (overridable through environment variables)**
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "prompt_engineering", "results.sqlite")
+)  # Empty string keeps the cache in memory only
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+RESULT_CACHE_MAX_ITEMS = int(os.environ.get("RESULT_CACHE_MAX_ITEMS", 50000))
+RESULT_CACHE_MEMORY_ITEMS = int(os.environ.get("RESULT_CACHE_MEMORY_ITEMS", 512))
+
+
+def normalize_text(text):
+    """Normalizes unicode, line endings and runs of whitespace so trivial edits share a key."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def make_key(text, model_id, **generation_kwargs):
+    """
+    Builds the cache key for one model call.
+
+    :param text: The model input.
+    :param model_id: Name of the model that produces the result.
+    :param generation_kwargs: Every argument that influences the output (max_length, ...).
+    :return: A hex SHA-256 digest.
+    """
+    payload = json.dumps(
+        {"input": normalize_text(text), "model": model_id, "kwargs": generation_kwargs},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache: an in-memory LRU in front of an SQLite table.
+
+    :param path: SQLite file for the disk tier. None or "" disables it.
+    :param ttl_seconds: Entries older than this are treated as misses and purged. 0 disables expiry.
+    :param max_items: Maximum number of rows kept on disk; least recently used rows are evicted.
+    :param memory_items: Maximum number of entries kept in memory.
+    """
+
+    def __init__(self, path=None, ttl_seconds=0, max_items=RESULT_CACHE_MAX_ITEMS, memory_items=RESULT_CACHE_MEMORY_ITEMS):
+        self.path = path or None
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self.memory_items = memory_items
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self._db = None
+        if self.path:
+            try:
+                self._open_db()
+            except (OSError, sqlite3.Error):
+                # Fall back to the memory tier if the cache file cannot be used
+                self._db = None
+
+    def _open_db(self):
+        """Opens (and creates if needed) the SQLite tier."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self._db.commit()
+
+    def _expired(self, created, now):
+        return bool(self.ttl_seconds) and now - created > self.ttl_seconds
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created = json.loads(row[0]), row[1]
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, created, value)
+                        self.hits_disk += 1
+                        return value
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Stores a JSON-serializable value under `key` in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._db.commit()
+            self._writes_since_trim += 1
+            if self._writes_since_trim >= 100:
+                self._trim_disk(now)
+
+    def clear(self):
+        """Removes every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self):
+        """Returns hit/miss counters and tier sizes."""
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            disk_items = 0
+            if self._db is not None:
+                disk_items = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_items": len(self._memory),
+                "disk_items": disk_items
+            }
+
+    def _remember(self, key, created, value):
+        """Adds an entry to the memory tier, evicting the least recently used one if full."""
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self, now):
+        """Purges expired rows and keeps the disk tier under max_items. Caller holds the lock."""
+        self._writes_since_trim = 0
+        if self.ttl_seconds:
+            cursor = self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+            self.evictions += cursor.rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count > self.max_items:
+            cursor = self._db.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                (count - self.max_items,)
+            )
+            self.evictions += cursor.rowcount
+        self._db.commit()
+
+
+# **Process-wide cache shared by every app**
+result_cache = ResultCache(
+    path=RESULT_CACHE_PATH,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_items=RESULT_CACHE_MAX_ITEMS,
+    memory_items=RESULT_CACHE_MEMORY_ITEMS
+)
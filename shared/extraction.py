@@ -0,0 +1,147 @@
+"""
+PDF text extraction shared by the summarizer and the grammar corrector.
+
+PyPDF2 is pure Python and single-core, so large PDFs are sharded into page
+ranges that are extracted across a ProcessPoolExecutor. Results always come
+back in page order, with the time spent on every page. Workers are spawned
+rather than forked, since the apps' processes run model threads. Pages are produced
+lazily through a bounded window of in-flight tasks, so long PDFs can be
+streamed straight into the chunked summarization and correction paths without
+the whole document being held in memory.
+"""
+
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import PyPDF2
+
+# **Extraction settings (overridable through environment variables)**
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", os.cpu_count() or 1))
+PAGES_PER_TASK = 16  # Pages extracted by one worker task
+MIN_PAGES_FOR_POOL = 2 * PAGES_PER_TASK  # Smaller documents are not worth the process start-up
+TASKS_IN_FLIGHT_PER_WORKER = 2  # Bounds how far extraction runs ahead of the consumer
+
+# PDF opened once per worker process by the pool initializer
+_worker_reader = None
+
+
+def _read_source(pdf_file):
+    """Returns something every worker can open: the path itself, or the file's bytes."""
+    if isinstance(pdf_file, str):
+        return pdf_file
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def _open_reader(source):
+    """Opens a PdfReader on a path or on raw bytes."""
+    return PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _init_worker(source):
+    """Pool initializer: parses the PDF once per worker instead of once per task."""
+    global _worker_reader
+    _worker_reader = _open_reader(source)
+
+
+def _extract_range(reader, start, stop):
+    """Extracts pages [start, stop) and returns one {"page", "text", "seconds"} dict per page."""
+    results = []
+    for index in range(start, stop):
+        began = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        results.append({"page": index, "text": text, "seconds": time.perf_counter() - began})
+    return results
+
+
+def _extract_range_in_worker(start, stop):
+    """Task run inside a pool worker."""
+    return _extract_range(_worker_reader, start, stop)
+
+
+def iter_pdf_page_results(pdf_file, start=0, stop=None, workers=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Yields {"page", "text", "seconds"} for every page of a PDF, in page order.
+
+    Documents with at least MIN_PAGES_FOR_POOL pages are split into ranges of
+    `pages_per_task` pages and extracted in a process pool. At most
+    TASKS_IN_FLIGHT_PER_WORKER tasks per worker run ahead of the consumer.
+
+    :param pdf_file: Path to the PDF or a binary file-like object (e.g. a Streamlit upload).
+    :param start: Index of the first page to extract (0-based).
+    :param stop: Index one past the last page to extract. None means the end of the document.
+    :param workers: Number of worker processes. Defaults to EXTRACTION_WORKERS; 1 disables the pool.
+    :param pages_per_task: Number of pages per worker task.
+    """
+    workers = workers or EXTRACTION_WORKERS
+    source = _read_source(pdf_file)
+    reader = _open_reader(source)
+    total = len(reader.pages)
+    start = max(start, 0)
+    stop = total if stop is None else min(stop, total)
+
+    if workers <= 1 or stop - start < MIN_PAGES_FOR_POOL:
+        for index in range(start, stop):
+            yield from _extract_range(reader, index, index + 1)
+        return
+
+    ranges = iter([(first, min(first + pages_per_task, stop)) for first in range(start, stop, pages_per_task)])
+    max_in_flight = workers * TASKS_IN_FLIGHT_PER_WORKER
+
+    # Spawned, not forked: the Streamlit process runs torch and other threads, and forking it can deadlock a worker
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=spawn, initializer=_init_worker, initargs=(source,)) as pool:
+        in_flight = deque(
+            pool.submit(_extract_range_in_worker, first, last)
+            for first, last in islice(ranges, max_in_flight)
+        )
+
+        while in_flight:
+            pages = in_flight.popleft().result()
+            # Keep the pool busy: replace the finished task before handing its pages out
+            next_range = next(ranges, None)
+            if next_range is not None:
+                in_flight.append(pool.submit(_extract_range_in_worker, *next_range))
+            yield from pages
+
+
+def iter_pdf_pages(pdf_file, start=0, stop=None, workers=None, timings=None):
+    """
+    Yields the text of each page of a PDF, lazily and in order.
+
+    :param pdf_file: Path to the PDF or a binary file-like object (e.g. a Streamlit upload).
+    :param start: Index of the first page to extract (0-based).
+    :param stop: Index one past the last page to extract. None means the end of the document.
+    :param workers: Number of extraction processes, see iter_pdf_page_results.
+    :param timings: Optional list that receives a {"page", "seconds"} dict for every extracted page.
+    :return: A generator of page texts. Pages without extractable text are skipped.
+    """
+    for page in iter_pdf_page_results(pdf_file, start, stop, workers):
+        if timings is not None:
+            timings.append({"page": page["page"], "seconds": page["seconds"]})
+        if page["text"]:
+            yield page["text"]
+
+
+def format_timings(timings):
+    """
+    Summarizes per-page extraction timings for display.
+
+    :param timings: The list filled by iter_pdf_pages.
+    :return: e.g. "Extracted 40 pages in 3.20s (slowest: page 12, 0.41s)", or an empty string.
+    """
+    if not timings:
+        return ""
+    slowest = max(timings, key=lambda timing: timing["seconds"])
+    total = sum(timing["seconds"] for timing in timings)
+    return (
+        f"Extracted {len(timings)} pages in {total:.2f}s "
+        f"(slowest: page {slowest['page'] + 1}, {slowest['seconds']:.2f}s)"
+    )
@@ -0,0 +1,168 @@
+"""
+ONNX Runtime backend for the encoder-decoder models.
+
+The BART summarizer, the coedit-large corrector and the t5-small therapist run
+generation through eager PyTorch on CPU. Their ONNX exports (an encoder graph,
+a decoder graph and a decoder-with-past graph that reuses the key/value cache)
+run through onnxruntime with IO binding instead, which removes most of the
+Python and operator dispatch overhead of every decoding step.
+
+Models are exported once into ONNX_MODEL_DIR:
+
+    python -m shared.onnx_backend export facebook/bart-large-cnn grammarly/coedit-large t5-small
+
+With MODEL_BACKEND=onnx, get_seq2seq_pipeline and get_seq2seq_tokenizer_and_model
+serve the exported graphs. Without an exported artifact, or without optimum
+installed, they fall back to the PyTorch models of the registry.
+"""
+
+import argparse
+import os
+
+from shared.registry import get_pipeline, get_tokenizer_and_model, registry
+
+# **Backend settings (overridable through environment variables)**
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "torch").lower()  # "torch" or "onnx"
+ONNX_MODEL_DIR = os.environ.get(
+    "ONNX_MODEL_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "prompt_engineering", "onnx")
+)
+
+# Encoder-decoder models used by the apps; exported by default
+SEQ2SEQ_MODELS = ["facebook/bart-large-cnn", "grammarly/coedit-large", "t5-small"]
+
+ENCODER_FILE = "encoder_model.onnx"
+
+# Models whose export failed to load; they stay on PyTorch for the rest of the process
+_failed_models = set()
+
+
+def artifact_dir(model):
+    """Returns the directory holding the ONNX export of a model."""
+    return os.path.join(ONNX_MODEL_DIR, model.replace("/", "--"))
+
+
+def has_artifact(model):
+    """Returns True if the model has been exported."""
+    return os.path.exists(os.path.join(artifact_dir(model), ENCODER_FILE))
+
+
+def _artifact_bytes(directory):
+    """Size of the exported graphs and weights, used as the registry memory estimate."""
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.endswith((".onnx", ".onnx_data"))
+    )
+
+
+def export_model(model, output_dir=None):
+    """
+    Exports a Hugging Face encoder-decoder model to ONNX.
+
+    Writes encoder_model.onnx, decoder_model.onnx and decoder_with_past_model.onnx
+    together with the config and tokenizer files.
+
+    :param model: Model name on the Hugging Face hub.
+    :param output_dir: Target directory. Defaults to artifact_dir(model).
+    :return: The directory the export was written to.
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer
+
+    output_dir = output_dir or artifact_dir(model)
+    exported = ORTModelForSeq2SeqLM.from_pretrained(model, export=True, use_cache=True)
+    exported.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model).save_pretrained(output_dir)
+    return output_dir
+
+
+def _load_onnx(model):
+    """Loads the exported tokenizer and ONNX Runtime model, with IO binding on the CPU provider."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer
+
+    directory = artifact_dir(model)
+    tokenizer = AutoTokenizer.from_pretrained(directory)
+    loaded = ORTModelForSeq2SeqLM.from_pretrained(
+        directory,
+        use_cache=True,
+        use_merged=False,
+        use_io_binding=True,
+        provider="CPUExecutionProvider"
+    )
+    return tokenizer, loaded
+
+
+def _use_onnx(model):
+    if MODEL_BACKEND != "onnx" or model in _failed_models or not has_artifact(model):
+        return False
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_seq2seq_pipeline(task, model, **kwargs):
+    """
+    Returns a shared pipeline for an encoder-decoder model, on ONNX Runtime when enabled.
+
+    :param task: Pipeline task, e.g. "summarization" or "text2text-generation".
+    :param model: Model name on the Hugging Face hub.
+    :param kwargs: Extra arguments for transformers.pipeline (device, ...).
+    :return: A pipeline running the ONNX export if MODEL_BACKEND=onnx and the model has
+             been exported, else the registry's PyTorch pipeline.
+    """
+    if _use_onnx(model):
+        from transformers import pipeline
+
+        def load():
+            tokenizer, loaded = _load_onnx(model)
+            return pipeline(task, model=loaded, tokenizer=tokenizer, **kwargs)
+
+        key = (model, task, "onnx") + tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+        try:
+            return registry.get(key, load, memory_of=lambda pipe: _artifact_bytes(artifact_dir(model)))
+        except Exception:
+            # A broken or incompatible export must not take the app down
+            _failed_models.add(model)
+    return get_pipeline(task, model=model, **kwargs)
+
+
+def get_seq2seq_tokenizer_and_model(model, model_class):
+    """
+    Returns a shared (tokenizer, model) pair whose model.generate runs on ONNX Runtime when enabled.
+
+    :param model: Model name on the Hugging Face hub.
+    :param model_class: transformers Auto class used by the PyTorch fallback.
+    """
+    if _use_onnx(model):
+        try:
+            return registry.get(
+                (model, "ORTModelForSeq2SeqLM", "onnx"),
+                lambda: _load_onnx(model),
+                memory_of=lambda pair: _artifact_bytes(artifact_dir(model))
+            )
+        except Exception:
+            _failed_models.add(model)
+    return get_tokenizer_and_model(model, model_class)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the encoder-decoder models to ONNX.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    export = subcommands.add_parser("export", help="Export models into ONNX_MODEL_DIR")
+    export.add_argument("models", nargs="*", default=SEQ2SEQ_MODELS, help="Hub model names (default: the apps' models)")
+    export.add_argument("--output-dir", help="Target directory (only with a single model)")
+    args = parser.parse_args()
+
+    if args.output_dir and len(args.models) != 1:
+        parser.error("--output-dir needs exactly one model")
+    for model in args.models:
+        print(f"Exporting {model} ...")
+        print(f"  written to {export_model(model, args.output_dir)}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Lazy, process-wide model registry.
+
+Every app used to build its Hugging Face pipeline at import time, which made
+cold starts slow and kept duplicate weights in memory when two apps ran in the
+same process. Models are now loaded on first use, keyed by (model, task, dtype),
+and shared between every caller that asks for the same key. An optional RAM
+budget evicts the least recently used models when a new one does not fit.
+
+The "qint8" dtype (or MODEL_QUANTIZATION=int8 for every model) applies PyTorch
+dynamic int8 quantization to the Linear layers at load time. Quantized models
+are saved to QUANTIZED_MODEL_DIR as state_dicts and loaded from there on later
+starts.
+"""
+
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+from torch import nn
+from transformers import AutoConfig, AutoTokenizer, GenerationConfig, pipeline
+from transformers.pipelines import check_task
+from transformers.pytorch_utils import Conv1D
+
+# Budget for all loaded models, in megabytes. Unset (or 0) means unlimited.
+MODEL_RAM_BUDGET_MB = float(os.environ.get("MODEL_RAM_BUDGET_MB", "0") or 0)
+
+# **Opt-in CPU int8 quantization**
+QUANTIZED_DTYPE = "qint8"
+MODEL_QUANTIZATION = os.environ.get("MODEL_QUANTIZATION", "").lower()  # "int8" quantizes every model
+DEFAULT_DTYPE = QUANTIZED_DTYPE if MODEL_QUANTIZATION in ("int8", QUANTIZED_DTYPE) else None
+QUANTIZED_MODEL_DIR = os.environ.get(
+    "QUANTIZED_MODEL_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "prompt_engineering", "quantized")
+)  # Empty string disables saving and loading pre-quantized models
+
+
+def model_memory_bytes(model):
+    """Returns the memory held by a model's parameters and buffers, in bytes."""
+    if model is None:
+        return 0
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    for module in model.modules():
+        # Dynamically quantized Linear layers keep their int8 weights outside of parameters()
+        if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None)):
+            total += module.weight().numel()
+    return total
+
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps them in least-recently-used order.
+
+    :param budget_mb: Maximum memory for all registered models. None or 0 disables eviction.
+    """
+
+    def __init__(self, budget_mb=None):
+        self.budget_bytes = int(budget_mb * 1024 * 1024) if budget_mb else 0
+        self._entries = OrderedDict()  # key -> {"value": ..., "bytes": ...}
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    def get(self, key, loader, memory_of=None):
+        """
+        Returns the object registered under `key`, calling `loader()` to build it if needed.
+
+        :param key: Hashable identifier, usually (model name, task, dtype).
+        :param loader: Zero-argument callable that builds the object.
+        :param memory_of: Callable returning the size in bytes of the built object.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]["value"]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available meanwhile,
+        # but never load the same key twice in parallel.
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key]["value"]
+
+            value = loader()
+            size = memory_of(value) if memory_of else 0
+
+            with self._lock:
+                self._entries[key] = {"value": value, "bytes": size}
+                self._evict(keep=key)
+                self._key_locks.pop(key, None)
+            return value
+
+    def evict(self, key):
+        """Drops a model from the registry. Returns True if it was loaded."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        del entry
+        gc.collect()
+        return True
+
+    def clear(self):
+        """Drops every loaded model."""
+        with self._lock:
+            self._entries.clear()
+        gc.collect()
+
+    def memory_usage(self):
+        """Returns the memory held by each loaded model, in bytes, least recently used first."""
+        with self._lock:
+            return OrderedDict((key, entry["bytes"]) for key, entry in self._entries.items())
+
+    def total_memory(self):
+        """Returns the memory held by all loaded models, in bytes."""
+        with self._lock:
+            return sum(entry["bytes"] for entry in self._entries.values())
+
+    def loaded_keys(self):
+        """Returns the keys of the loaded models, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def _evict(self, keep):
+        """Evicts least recently used models until the budget holds. Caller holds the lock."""
+        if not self.budget_bytes:
+            return
+        evicted = False
+        while self.total_memory() > self.budget_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._entries.pop(oldest)
+            evicted = True
+        if evicted:
+            gc.collect()
+
+
+# **Process-wide registry used by every app**
+registry = ModelRegistry(budget_mb=MODEL_RAM_BUDGET_MB)
+
+
+def _torch_dtype(dtype):
+    """Maps a dtype name such as "float16" to the torch dtype. None and "qint8" load the default fp32 weights."""
+    if dtype is None or dtype == QUANTIZED_DTYPE:
+        return None
+    if isinstance(dtype, torch.dtype):
+        return dtype
+    return getattr(torch, dtype)
+
+
+def _conv1d_to_linear(model):
+    """
+    Replaces GPT-2 style Conv1D layers by equivalent nn.Linear layers.
+
+    Conv1D is a Linear with a transposed weight, but quantize_dynamic only
+    recognizes nn.Linear, so GPT-2 models would otherwise stay in fp32.
+    """
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                linear = nn.Linear(child.weight.shape[0], child.nf)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, name, linear)
+    return model
+
+
+def quantize_model(model):
+    """Quantizes the Linear layers of a model to int8 for CPU inference (weights only, dynamic activations)."""
+    model = _conv1d_to_linear(model)
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def _quantized_path(model, variant):
+    if not QUANTIZED_MODEL_DIR:
+        return None
+    return os.path.join(QUANTIZED_MODEL_DIR, f"{model.replace('/', '--')}--{variant}.{QUANTIZED_DTYPE}.pt")
+
+
+def load_quantized_model(model, variant, load_fp32, build_fp32):
+    """
+    Returns an int8 model, from QUANTIZED_MODEL_DIR when a saved copy exists.
+
+    Only the quantized state_dict is saved. It is loaded with weights_only=True into a
+    freshly built and quantized architecture, so nothing in the cache directory is unpickled
+    as code.
+
+    :param model: Model name on the Hugging Face hub.
+    :param variant: Task or model class the model was loaded for; part of the file name.
+    :param load_fp32: Zero-argument callable loading the fp32 model when no saved copy is usable.
+    :param build_fp32: Zero-argument callable building the fp32 architecture from the model's config.
+    """
+    path = _quantized_path(model, variant)
+    if path and os.path.exists(path):
+        try:
+            state_dict = torch.load(path, weights_only=True)
+            loaded = quantize_model(build_fp32())
+            loaded.load_state_dict(state_dict)
+            loaded.eval()
+            return loaded
+        except Exception:
+            # Artifacts written by other torch/transformers versions may not load: rebuild them
+            pass
+
+    quantized = quantize_model(load_fp32())
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            torch.save(quantized.state_dict(), path)
+        except OSError:
+            pass
+    return quantized
+
+
+def _build_from_config(model_class, model):
+    """Builds the fp32 architecture of a model without loading its weights, with its generation defaults."""
+    built = model_class.from_config(AutoConfig.from_pretrained(model))
+    try:
+        built.generation_config = GenerationConfig.from_pretrained(model)
+    except OSError:
+        # Models without a generation_config.json keep the defaults derived from their config
+        pass
+    return built
+
+
+def _pipeline_model_class(task):
+    """Returns the first Auto model class transformers.pipeline tries for a task."""
+    _, task_defaults, _ = check_task(task)
+    return task_defaults["pt"][0]
+
+
+def get_pipeline(task, model, dtype=None, **kwargs):
+    """
+    Returns a shared Hugging Face pipeline, loading it on first use.
+
+    :param task: Pipeline task, e.g. "summarization" or "text-generation".
+    :param model: Model name on the Hugging Face hub.
+    :param dtype: Optional torch dtype name ("float32", "bfloat16", ...) or "qint8" for int8
+                  dynamic quantization. Defaults to DEFAULT_DTYPE.
+    :param kwargs: Extra arguments for transformers.pipeline (device, ...). They are part of the key.
+    :return: The loaded pipeline.
+    """
+    dtype = dtype or DEFAULT_DTYPE
+    key = (model, task, str(dtype)) + tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+
+    def load():
+        if dtype == QUANTIZED_DTYPE:
+            quantized = load_quantized_model(
+                model, task, lambda: pipeline(task, model=model, **kwargs).model,
+                lambda: _build_from_config(_pipeline_model_class(task), model)
+            )
+            return pipeline(task, model=quantized, tokenizer=model, **kwargs)
+        if dtype is not None:
+            kwargs["torch_dtype"] = _torch_dtype(dtype)
+        return pipeline(task, model=model, **kwargs)
+
+    return registry.get(key, load, memory_of=lambda pipe: model_memory_bytes(pipe.model))
+
+
+def get_tokenizer_and_model(model, model_class, dtype=None):
+    """
+    Returns a shared (tokenizer, model) pair for callers that drive `model.generate` directly.
+
+    :param model: Model name on the Hugging Face hub.
+    :param model_class: transformers Auto class used to load the model, e.g. AutoModelForSeq2SeqLM.
+    :param dtype: Optional torch dtype name, or "qint8". Defaults to DEFAULT_DTYPE.
+    """
+    dtype = dtype or DEFAULT_DTYPE
+    key = (model, model_class.__name__, str(dtype))
+
+    def load():
+        tokenizer = AutoTokenizer.from_pretrained(model)
+        if dtype == QUANTIZED_DTYPE:
+            loaded = load_quantized_model(
+                model, model_class.__name__, lambda: model_class.from_pretrained(model),
+                lambda: _build_from_config(model_class, model)
+            )
+        else:
+            loaded = model_class.from_pretrained(model, torch_dtype=_torch_dtype(dtype))
+        loaded.eval()
+        return tokenizer, loaded
+
+    return registry.get(key, load, memory_of=lambda pair: model_memory_bytes(pair[1]))
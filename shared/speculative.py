@@ -0,0 +1,171 @@
+"""
+Speculative decoding of the gpt2-medium generators with distilgpt2 as draft model.
+
+The recipe and quiz generators decode with gpt2-medium, one full forward pass
+of the target model per generated token. distilgpt2, already loaded by the
+story generator, shares GPT-2's tokenizer. With SPECULATIVE_DECODING=1,
+run_speculative passes it to generate as transformers' assistant_model:
+distilgpt2 drafts a few tokens, and gpt2-medium verifies all of them in one
+forward pass and keeps the longest accepted run. Verification follows the
+target model's distribution (greedy output is unchanged), so only the speed
+changes, and only for the better when enough drafted tokens are accepted.
+
+Assisted generation decodes a single sequence. run_speculative therefore
+falls back to a plain run_pipeline call under dynamic batching, for
+num_return_sequences or num_beams above 1, with custom logits processors
+(their per-step state does not survive rejected drafts), and when the draft
+model cannot be loaded or has another vocabulary.
+
+speculative_stats() reports, per app, the drafted and accepted tokens, the
+acceptance rate, the tokens gained per target forward pass and the decoding
+speed. benchmarks/bench_speculative.py compares CPU tokens/sec with plain
+sampling.
+"""
+
+import os
+import threading
+import time
+import weakref
+
+from shared.batching import DYNAMIC_BATCHING, run_pipeline
+from shared.registry import get_pipeline
+
+# **Speculative decoding settings (overridable through environment variables)**
+SPECULATIVE_DECODING = os.environ.get("SPECULATIVE_DECODING", "").lower() in ("1", "true", "yes")
+DRAFT_MODEL_NAME = os.environ.get("SPECULATIVE_DRAFT_MODEL", "distilgpt2")  # Same registry entry as the story app
+
+_local = threading.local()  # Forward-pass counters of the assisted call running on this thread
+_hooked = weakref.WeakKeyDictionary()  # model -> counter its forward hook increments
+_stats = {}  # name -> counters
+_stats_lock = threading.Lock()
+
+
+def get_draft_model():
+    """Returns the shared draft model (the model of the DRAFT_MODEL_NAME text-generation pipeline)."""
+    return get_pipeline("text-generation", model=DRAFT_MODEL_NAME).model
+
+
+def _count_forwards(model, field):
+    """Counts the forward passes of `model` made by assisted calls on the current thread."""
+    if model in _hooked:
+        return
+
+    def hook(module, inputs, output):
+        counters = getattr(_local, "counters", None)
+        if counters is not None:
+            counters[field] += 1
+
+    model.register_forward_hook(hook)
+    _hooked[model] = field
+
+
+def _record(name, **amounts):
+    with _stats_lock:
+        counters = _stats.setdefault(name, {
+            "calls": 0, "fallbacks": 0, "new_tokens": 0, "draft_tokens": 0, "accepted_tokens": 0,
+            "target_forwards": 0, "seconds": 0.0
+        })
+        for field, amount in amounts.items():
+            counters[field] += amount
+
+
+def _new_tokens(tokenizer, prompt, outputs, full_text):
+    """Tokens generated for `prompt`, counted by re-tokenizing the pipeline's output."""
+    prompt_tokens = len(tokenizer(prompt)["input_ids"]) if full_text else 0
+    return sum(
+        max(0, len(tokenizer(output["generated_text"])["input_ids"]) - prompt_tokens) for output in outputs
+    )
+
+
+def generate_with_draft(pipe, draft, prompt, name=None, **kwargs):
+    """
+    Runs pipe(prompt, **kwargs) with `draft` as assistant model and records its acceptance statistics.
+
+    :param pipe: The target text-generation pipeline.
+    :param draft: Draft model sharing the target's tokenizer.
+    :param prompt: One prompt.
+    :param name: Name the statistics are reported under.
+    :param kwargs: Pipeline arguments; a single sequence is generated.
+    :return: The pipeline's output.
+    """
+    name = name or pipe.model.name_or_path
+    _count_forwards(pipe.model, "target_forwards")
+    _count_forwards(draft, "draft_forwards")
+    counters = {"target_forwards": 0, "draft_forwards": 0}
+    _local.counters = counters
+    start = time.perf_counter()
+    try:
+        outputs = pipe(prompt, assistant_model=draft, **kwargs)
+    finally:
+        _local.counters = None
+    seconds = time.perf_counter() - start
+
+    new_tokens = _new_tokens(pipe.tokenizer, prompt, outputs, kwargs.get("return_full_text", True))
+    # Every verification pass yields the accepted drafted tokens plus one token of the target model
+    accepted = min(counters["draft_forwards"], max(0, new_tokens - counters["target_forwards"]))
+    _record(
+        name, calls=1, new_tokens=new_tokens, draft_tokens=counters["draft_forwards"], accepted_tokens=accepted,
+        target_forwards=counters["target_forwards"], seconds=seconds
+    )
+    return outputs
+
+
+def _draft_for(pipe, prompt, kwargs):
+    """Returns the draft model for this call, or None when assisted generation does not apply."""
+    if DYNAMIC_BATCHING or not isinstance(prompt, str):
+        return None
+    if kwargs.get("num_return_sequences", 1) > 1 or kwargs.get("num_beams", 1) > 1 or "logits_processor" in kwargs:
+        return None
+    try:
+        draft = get_draft_model()
+    except Exception as e:
+        print(f"❌ Error loading draft model {DRAFT_MODEL_NAME}: {str(e)}")
+        return None
+    if draft is pipe.model or draft.config.vocab_size != pipe.model.config.vocab_size:
+        return None
+    return draft
+
+
+def run_speculative(get_pipe, prompt, name=None, **kwargs):
+    """
+    Calls get_pipe()(prompt, **kwargs) with the draft model as assistant when speculative decoding applies.
+
+    Without SPECULATIVE_DECODING this is run_pipeline. Calls that cannot be assisted go
+    through run_pipeline and are counted as fallbacks.
+
+    :param get_pipe: Accessor of the shared target pipeline, e.g. get_recipe_generator.
+    :param prompt: The prompt.
+    :param name: Name the statistics are reported under (default: the accessor's name).
+    :param kwargs: Pipeline arguments.
+    :return: The pipeline's output.
+    """
+    if not SPECULATIVE_DECODING:
+        return run_pipeline(get_pipe, prompt, **kwargs)
+
+    name = name or get_pipe.__qualname__
+    pipe = get_pipe()
+    draft = _draft_for(pipe, prompt, kwargs)
+    if draft is None:
+        _record(name, fallbacks=1)
+        return run_pipeline(get_pipe, prompt, **kwargs)
+    return generate_with_draft(pipe, draft, prompt, name=name, **kwargs)
+
+
+def speculative_stats():
+    """Returns per-app call counts, acceptance rate, tokens per target forward pass and tokens/sec."""
+    with _stats_lock:
+        stats = {name: dict(counters) for name, counters in _stats.items()}
+    for counters in stats.values():
+        counters["acceptance_rate"] = (
+            counters["accepted_tokens"] / counters["draft_tokens"] if counters["draft_tokens"] else 0.0
+        )
+        counters["tokens_per_forward"] = (
+            counters["new_tokens"] / counters["target_forwards"] if counters["target_forwards"] else 0.0
+        )
+        counters["tokens_per_second"] = counters["new_tokens"] / counters["seconds"] if counters["seconds"] else 0.0
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Token streaming for the text-generation apps.
+
+`pipeline(...)` calls block until the last token is decoded. `stream_generate`
+runs `model.generate` on a background thread with a TextIteratorStreamer and
+yields text as soon as it is decoded, so the Streamlit apps can show the first
+words after one decoding step instead of after the whole sequence. When the
+consumer stops early (a Streamlit rerun, a `break`), generation is cancelled at
+the next decoding step instead of running to the end.
+"""
+
+import threading
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+
+class _CancelledCriteria(StoppingCriteria):
+    """Stops generation once its event is set."""
+
+    def __init__(self, cancelled):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def stream_generate(pipe, prompt, include_prompt=True, **generate_kwargs):
+    """
+    Yields the text generated for `prompt` piece by piece.
+
+    :param pipe: A loaded text-generation pipeline (its model and tokenizer are used).
+    :param prompt: The prompt to continue.
+    :param include_prompt: Yield the prompt first, like the pipeline's default full-text output.
+    :param generate_kwargs: Arguments for model.generate (max_length, temperature, ...).
+    """
+    tokenizer = pipe.tokenizer
+    inputs = tokenizer(prompt, return_tensors="pt")
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+    generate_kwargs = dict(generate_kwargs)
+    if tokenizer.pad_token_id is None:
+        generate_kwargs.setdefault("pad_token_id", tokenizer.eos_token_id)
+    cancelled = threading.Event()
+    generate_kwargs["stopping_criteria"] = StoppingCriteriaList(
+        list(generate_kwargs.get("stopping_criteria") or []) + [_CancelledCriteria(cancelled)]
+    )
+
+    errors = []
+
+    def run():
+        try:
+            pipe.model.generate(**inputs, streamer=streamer, **generate_kwargs)
+        except Exception as e:
+            # Unblock the consumer, then surface the error on its side
+            errors.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        if include_prompt:
+            yield prompt
+        for text in streamer:
+            if text:
+                yield text
+    finally:
+        # Also reached when the consumer abandons the generator: stop decoding before waiting for it
+        cancelled.set()
+        thread.join()
+
+    if errors:
+        raise errors[0]
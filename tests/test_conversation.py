@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Virtual Therapist"))
+import conversation
+from conversation import ConversationState
+
+MESSAGES = ["You: I could not sleep again", "Therapist: What kept you awake?", "You: work, mostly"]
+SUFFIX = "Respond with empathy: I keep thinking about my deadline"
+
+
+class WordTokenizer:
+    """Maps words to ids, so the test needs no downloaded vocabulary."""
+
+    eos_token_id = 1
+    vocab_size = 512
+
+    def _ids(self, text, add_special_tokens):
+        ids = [2 + sum(map(ord, word)) % (self.vocab_size - 2) for word in text.split()]
+        return ids + [self.eos_token_id] if add_special_tokens else ids
+
+    def __call__(self, text, return_tensors=None, add_special_tokens=True):
+        return {"input_ids": torch.tensor([self._ids(text, add_special_tokens)])}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(str(int(token)) for token in ids if not skip_special_tokens or int(token) > 1)
+
+
+@pytest.fixture(scope="module")
+def get_model():
+    torch.manual_seed(0)
+    config = transformers.T5Config(
+        vocab_size=WordTokenizer.vocab_size, d_model=32, d_kv=8, d_ff=64, num_layers=2, num_heads=4,
+        decoder_start_token_id=0, pad_token_id=0, eos_token_id=1
+    )
+    model = transformers.T5ForConditionalGeneration(config).eval()
+    tokenizer = WordTokenizer()
+    return lambda: (tokenizer, model)
+
+
+def _state(get_model):
+    state = ConversationState(get_model)
+    for message in MESSAGES:
+        state.append(message)
+    return state
+
+
+def _full_encoding(get_model, text):
+    tokenizer, model = get_model()
+    with torch.no_grad():
+        output_ids = model.generate(tokenizer(text)["input_ids"], max_new_tokens=12, do_sample=False)
+    return tokenizer.decode(output_ids[0])
+
+
+def test_default_encodes_the_joined_window(get_model, monkeypatch):
+    monkeypatch.setattr(conversation, "ENCODER_CACHING", False)
+    state = _state(get_model)
+    reply = state.generate(SUFFIX, max_new_tokens=12, do_sample=False)
+    assert reply == _full_encoding(get_model, state.input_text(SUFFIX))
+    assert state.encoded_tokens == 0
+
+
+def test_encoder_cache_approximates_full_encoding(get_model, monkeypatch):
+    monkeypatch.setattr(conversation, "ENCODER_CACHING", True)
+    state = _state(get_model)
+    tokenizer, model = get_model()
+    full_ids = tokenizer(state.input_text(SUFFIX))["input_ids"]
+    with torch.no_grad():
+        full_states = model.get_encoder()(input_ids=full_ids).last_hidden_state
+
+    state.generate(SUFFIX, max_new_tokens=12, do_sample=False)
+    cached_states = torch.cat([entry[1] for entry in state._messages], dim=1)
+    # Same tokens are encoded, but each message without attending to its neighbours
+    assert state.encoded_tokens == full_ids.shape[1]
+    assert cached_states.shape[1] == full_ids.shape[1] - len(tokenizer(SUFFIX)["input_ids"][0])
+    assert not torch.allclose(cached_states, full_states[:, :cached_states.shape[1]])
+
+
+def test_encoder_cache_is_exact_for_a_single_segment(get_model, monkeypatch):
+    monkeypatch.setattr(conversation, "ENCODER_CACHING", True)
+    state = ConversationState(get_model)
+    reply = state.generate(SUFFIX, max_new_tokens=12, do_sample=False)
+    assert reply == _full_encoding(get_model, state.input_text(SUFFIX))
\ No newline at end of file
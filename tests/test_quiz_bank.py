@@ -0,0 +1,41 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "QuizGenerator"))
+from quiz_bank import QuizBank
+
+
+def _run_live(bank, barrier, entered):
+    with bank.live_generation():
+        entered.append(time.monotonic())
+        barrier.wait(timeout=5)
+
+
+def test_live_generations_overlap_without_refills(tmp_path):
+    bank = QuizBank(lambda field, role, count: [], path=str(tmp_path / "bank.sqlite"))
+    # Both threads must be inside live_generation at once to pass the barrier
+    barrier, entered = threading.Barrier(2), []
+    threads = [threading.Thread(target=_run_live, args=(bank, barrier, entered)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert len(entered) == 2
+    assert not barrier.broken
+
+
+def test_refill_waits_for_live_generation(tmp_path):
+    generated = threading.Event()
+    question = {"question": "1. What is 2 + 2?", "options": ["A. 3", "B. 4", "C. 5", "D. 6"], "answer": "B"}
+
+    def generate(field, role, count):
+        generated.set()
+        return [question]
+
+    bank = QuizBank(generate, path=str(tmp_path / "bank.sqlite"), refill_questions=1)
+    with bank.live_generation():
+        future = bank.schedule_refill("IT", "Developer")
+        assert not generated.wait(timeout=0.5)
+    assert future.result(timeout=5) == 1
\ No newline at end of file